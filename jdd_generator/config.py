@@ -23,24 +23,38 @@ logger = logging.getLogger("config")
 config = SafeConfigParser()
 
 
+def get_config_path(path=None):
+    """Donne le chemin du fichier de configuration à charger.
+
+    Args:
+        path (unicode): chemin vers le fichier de config, ou `None` pour le
+            fichier par défaut.
+
+    Returns:
+        unicode: chemin du fichier de config.
+    """
+    if path is not None:
+        return path
+
+    jdd_generator_path = os.path.dirname(
+            os.path.abspath(__file__.decode(filesystem_encoding))
+            )
+
+    return os.path.join(jdd_generator_path, CONFIG_FILE_NAME)
+
+
 def set_config(path=None):
     """Charge un fichier de configuration dans le module
 
-    La fonction altère directement l'objet `config` dans le module.
+    La fonction altère directement l'objet `config` dans le module. Une
+    configuration déjà chargée est remplacée.
 
     Args:
         path (unicode): chemin vers le fichier de config.
     """
     # préparer le chemin du fichier de config
-    if path is None:
-        jdd_generator_path = os.path.dirname(
-                os.path.abspath(__file__.decode(filesystem_encoding))
-                )
-
-        config_file_path = os.path.join(jdd_generator_path, CONFIG_FILE_NAME)
-
-    else:
-        config_file_path = path
+    config_file_path = get_config_path(path)
+    if path is not None:
         logger.info("Fichier de config à utiliser : \"{}\"".format(config_file_path))
 
     # vérifier que le fichier existe
@@ -49,6 +63,11 @@ def set_config(path=None):
 trouvé".format(config_file_path).encode(sys.stderr.encoding))
 
     # charger la config
+    # On oublie la config précédente, pour qu'une option supprimée du fichier
+    # ne reste pas en mémoire lors d'un rechargement.
+    for section in config.sections():
+        config.remove_section(section)
+
     with open(config_file_path, 'r', encoding='utf8') as file:
         config.readfp(file)
 
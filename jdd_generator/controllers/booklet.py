@@ -4,21 +4,30 @@ from __future__ import absolute_import
 
 import os
 import sys
+import copy
 import logging
-from glob import glob
+from collections import namedtuple
+from contextlib import closing
 from colour import Color
 
 from ..utils import utils
-from ..utils.csv_dict import CSVDict
 from ..models.booklet import Section, Abstract
 from .jdd import BasicController, OUTPUT_DIRECTORY
-from .planning import STUDENTS_FILE, REPARTITIONS_FILE
+from .planning import STUDENTS_FILE, REPARTITIONS_FILE, REPARTITIONS_TYPES
 from ..views.booklet import BookletView, PICTURES_TARGET_DIRECTORY
 
 
 BOOKLET_FILE = 'booklet.ini'
 ABSTRACT_FILES = 'abstracts.ini'
 PICTURES_DIRECTORY = 'photos'
+BOOKLET_TYPES = {'number': 'int'}
+
+# ordre de préférence des extensions quand un doctorant a plusieurs photos,
+# le même que pdfLaTeX
+PICTURES_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg')
+
+
+Picture = namedtuple('Picture', ['file_name', 'extension', 'size', 'mtime'])
 
 
 class BookletController(BasicController):
@@ -35,15 +44,22 @@ class BookletController(BasicController):
         abstracts (:obj:`list` of :obj:`Abstract`): liste des résumés (n'a pas
             vraiment de sens en tant qu'attribut, mais ça permet de faciliter le
             passage de cette variable).
+        abstracts_by_code (dict): index des résumés par code, tenu à jour par
+            `_add_abstract`.
         sections (:obj:`list` of :obj:`Section`): liste des sections du recueil.
         directory_pictures (unicode): dossier source pour les photos.
+        pictures (dict): index des photos du dossier source par code, sous
+            forme de :obj:`Picture`.
     """
     logger = logging.getLogger('controllers.booklet.BookletController')
 
-    def __init__(self):
+    def __init__(self, **kwargs):
+        super(BookletController, self).__init__(**kwargs)
         self.abstracts = []
+        self.abstracts_by_code = {}
         self.sections = []
         self.directory_pictures = ''
+        self.pictures = {}
 
     def create(self, booklet_file=BOOKLET_FILE, abstracts_file=ABSTRACT_FILES,
             students_file=STUDENTS_FILE, repartitions_file=REPARTITIONS_FILE,
@@ -97,15 +113,20 @@ class BookletController(BasicController):
             directory (unicode): dossier de sortie où enregistrer les fichiers.
 
         """
-        # on crée une vue et on lui passe les données
-        view = BookletView()
-        files_content = view.retrieve(self.sections)
-
         # dossier pour écrire les fichiers du recuiel de résumés courts
         directory_booklet = os.path.join(directory, 'booklet')
 
+        # on crée une vue et on lui passe les données
+        view = BookletView(
+                jobs=self.jobs,
+                manifest=self._read_manifest(directory_booklet)
+                )
+
+        files_content = view.retrieve(self.sections)
+
         # écrire
         self._write(files_content, directory_booklet)
+        self._write_manifest(files_content, directory_booklet)
 
         # créer le lien du dossier de photos
         self._create_directory_picture_link(directory_booklet)
@@ -125,6 +146,48 @@ valide".format(directory_pictures).encode(sys.stderr.encoding))
 
         # on le charge
         self.directory_pictures = directory_pictures
+        self._index_pictures()
+
+    def _index_pictures(self):
+        """Indexe les photos du dossier source par code.
+
+        Le dossier n'est parcouru qu'une seule fois. Le code d'une photo est
+        son nom de fichier sans l'extension. Si plusieurs photos ont le même
+        code, l'extension préférée est celle qui vient en premier dans
+        `PICTURES_EXTENSIONS`.
+
+        """
+        def preference(picture):
+            extension = picture.extension.lower()
+            if extension in PICTURES_EXTENSIONS:
+                return (PICTURES_EXTENSIONS.index(extension), extension)
+
+            return (len(PICTURES_EXTENSIONS), extension)
+
+        self.pictures = {}
+        for file_name in os.listdir(self.directory_pictures):
+            # ignorer les fichiers cachés et ceux sans extension
+            code, extension = os.path.splitext(file_name)
+            if file_name.startswith('.') or not extension:
+                continue
+
+            path = os.path.join(self.directory_pictures, file_name)
+            if not os.path.isfile(path):
+                continue
+
+            stat = os.stat(path)
+            picture = Picture(file_name, extension, stat.st_size, stat.st_mtime)
+
+            if code in self.pictures and \
+                    preference(self.pictures[code]) <= preference(picture):
+                continue
+
+            self.pictures[code] = picture
+
+        self.logger.debug("Indexe {amount} photos dans \"{directory}\"".format(
+            amount=len(self.pictures),
+            directory=self.directory_pictures
+            ))
 
     def _create_sections(self, booklet_file):
         """Extraire les données du fichier de configuration du recueil.
@@ -133,9 +196,8 @@ valide".format(directory_pictures).encode(sys.stderr.encoding))
             booklet_file (unicode): fichier de configuration pour charger le
                 listing CSV des sections du recueil.
         """
-        # lire le fichier CSV
-        sections = CSVDict()
-        sections.read(booklet_file)
+        # lire le fichier CSV au fil de l'eau
+        sections = self._csv_dict().iter_rows(booklet_file, BOOKLET_TYPES)
 
         # parcourir toutes les sections
         for section in sections:
@@ -152,7 +214,7 @@ valide".format(directory_pictures).encode(sys.stderr.encoding))
 
             # on crée la section
             section_obj = Section(
-                    number=int(section['number']),
+                    number=section['number'],
                     color=color
                     )
 
@@ -168,47 +230,42 @@ valide".format(directory_pictures).encode(sys.stderr.encoding))
             abstracts_file (unicode): fichier de configuration pour charger le
                 listing CSV des résumés.
         """
-        # ouvrir le fichier CSV
-        abstracts = CSVDict()
-        abstracts.read(abstracts_file)
-
-        # initialiser les résumés
-        # On stocke les résumés dans l'instance de la classe parce que ça
-        # simplifie leur accès.
-        self.abstracts = []
-
-        # on parcours chaque résumé
-        for abstract in abstracts:
-            code = abstract['code']
-
-            # test de validité
-            # Si le résumé n'a pas de contenu (le texte du résumé lui-même), on
-            # logge et on continue.
-            if not abstract['text']:
-                self.logger.warning("La ligne \"{}\" n'a pas de résumé".format(
-                    code
-                    ))
-
-                continue
-
-            # TODO nettoyer la ligne des caractères exotiques
-            text = abstract['text']
-
-            # on récupère les mots clés et on en fait une liste
-            keywords = [l.strip() for l in \
-                    abstract['keywords'].replace(';', ',').split(',')]
-
-            # on crée et sauvegarde l'objet
-            abstract_obj = Abstract(
-                    code=code,
-                    text=text,
-                    keywords=keywords
-                    )
-
-            self.abstracts.append(abstract_obj)
-
-            self.logger.debug("Ajoute le résumé \"{abstract}\" au \
-contrôleur".format(abstract=abstract_obj))
+        # ouvrir le fichier CSV, indexé par code
+        with closing(self._index_csv(abstracts_file)) as abstracts:
+            # initialiser les résumés
+            # On stocke les résumés dans l'instance de la classe parce que ça
+            # simplifie leur accès.
+            self.abstracts = []
+            self.abstracts_by_code = {}
+
+            # on parcours chaque résumé
+            for abstract in abstracts.itervalues():
+                code = abstract['code']
+
+                # test de validité
+                # Si le résumé n'a pas de contenu (le texte du résumé
+                # lui-même), on logge et on continue.
+                if not abstract['text']:
+                    self.logger.warning("La ligne \"{}\" n'a pas de \
+résumé".format(code))
+
+                    continue
+
+                # TODO nettoyer la ligne des caractères exotiques
+                text = abstract['text']
+
+                # on récupère les mots clés et on en fait une liste
+                keywords = [l.strip() for l in \
+                        abstract['keywords'].replace(';', ',').split(',')]
+
+                # on crée et sauvegarde l'objet
+                abstract_obj = Abstract(
+                        code=code,
+                        text=text,
+                        keywords=keywords
+                        )
+
+                self._add_abstract(abstract_obj)
 
     def _apply_phds(self, students_file):
         """Ajouter les thèses
@@ -241,13 +298,18 @@ contrôleur".format(abstract=abstract_obj))
                 continue
 
             # vérifier qu'une photo existe
-            path_picture = os.path.join(self.directory_pictures, code)
-            if not glob(path_picture + '.*'):
+            picture = self.pictures.get(code)
+            if picture is None:
                 self.logger.warning("Le doctorant \"{student}\" n'a pas de \
 photo".format(student=phd.student))
 
-                # ne plus faire référence à la photo
-                phd.student.picture = ''
+            # faire référence au fichier de la photo, extension comprise, ou
+            # ne plus y faire référence s'il n'existe pas
+            # Les thèses sont partagées avec les autres contrôleurs, on
+            # modifie donc une copie.
+            phd = copy.copy(phd)
+            phd.student = copy.copy(phd.student)
+            phd.student.picture = picture.file_name if picture else ''
 
             # ajouter la thèse
             abstract.set_phd(phd)
@@ -270,40 +332,41 @@ photo".format(student=phd.student))
                 le listing CVS des timings, qui contient l'affectation de chaque
                 résumé dans les sections.
         """
-        # lire le fichier CSV
-        repartitions = CSVDict()
-        repartitions.read(repartitions_file)
-
-        # on parcours chaque timimg
-        for repartition in repartitions:
-            # on récupère le résumé avec le code
-            code = repartition['code']
-            abstract = self._get_abstract_by_code(code)
-
-            # Si aucun résumé ne correspond au code, logger l'erreur et
-            # continuer.
-            if abstract is None:
-                self.logger.warning("La ligne de répartiton des timings \
+        # lire le fichier CSV, indexé par code
+        # Comme pour le planning, la dernière ligne d'un code présent
+        # plusieurs fois l'emporte, et l'index est partagé avec celui-ci.
+        with closing(self._index_csv(repartitions_file,
+                types=REPARTITIONS_TYPES, last=True)) as repartitions:
+            # on parcours chaque timimg
+            for repartition in repartitions.itervalues():
+                # on récupère le résumé avec le code
+                code = repartition['code']
+                abstract = self._get_abstract_by_code(code)
+
+                # Si aucun résumé ne correspond au code, logger l'erreur et
+                # continuer.
+                if abstract is None:
+                    self.logger.warning("La ligne de répartiton des timings \
 \"{code}\" ne correspond à aucun résumé".format(
-                    code=code
-                    ))
+                        code=code
+                        ))
 
-                continue
+                    continue
 
-            # vérifier que le résumé a bien une thèse attribuée
-            if abstract.phd is None:
-                self.logger.warning("Le résumé \"{code}\" n'est pas \
+                # vérifier que le résumé a bien une thèse attribuée
+                if abstract.phd is None:
+                    self.logger.warning("Le résumé \"{code}\" n'est pas \
 associé à une thèse".format(
-                    code=abstract.code
-                    ))
+                        code=abstract.code
+                        ))
 
-                continue
+                    continue
 
-            # on récupère les infos qui nous intéressent
-            abstract.section_number = int(repartition['session'])
-            abstract.order = int(repartition['order'])
+                # on récupère les infos qui nous intéressent
+                abstract.section_number = repartition['session']
+                abstract.order = repartition['order']
 
-            self.logger.debug("Ajoute les infos de répartition au résumé \
+                self.logger.debug("Ajoute les infos de répartition au résumé \
 \"{abstract}\"".format(abstract=abstract))
 
     def _sort_sections(self):
@@ -318,29 +381,61 @@ associé à une thèse".format(
         """Affecter les présentations aux sections et les trier.
 
         """
+        # on répartit les résumés par section et on les trie par ordre
+        groups, orphans = self._group(
+                self.abstracts,
+                'section_number',
+                [section.number for section in self.sections]
+                )
+
+        # signaler les résumés attribués à une section inexistante
+        # Les résumés sans répartition gardent le numéro 0 par défaut.
+        for abstract in orphans:
+            if not abstract.section_number:
+                continue
+
+            self.logger.warning("Le résumé \"{abstract}\" est attribué à la \
+section {number}, qui n'existe pas dans le recueil".format(
+                abstract=abstract,
+                number=abstract.section_number
+                ))
+
         # on parcours les sections
         for section in self.sections:
             # on récupère les résumés qui sont associés à cette section
-            abstracts = self._get_abstracts_by_section_number(section.number)
-            abstracts.sort(key=lambda a: a.order)
+            abstracts = groups[section.number]
 
             # on ajoute l'info de couleur et on affecte le résumé à la section
             for abstract in abstracts:
                 abstract.color = section.color
                 section.add_abstract(abstract)
 
-    def _get_abstracts_by_section_number(self, number):
-        """Retourne une liste de résumés de la même section.
+    def _add_abstract(self, abstract):
+        """Ajoute un résumé au contrôleur et l'indexe par son code.
 
-        Args:
-            number (int): numéro de section.
+        Si le code est déjà utilisé, le résumé est tout de même ajouté, mais
+        l'index continue de désigner le premier résumé.
 
-        Returns:
-            :obj:`list` of :obj:`Abstract`: liste de résumés associées à cette
-            section.
+        Args:
+            abstract (:obj:`Abstract`): résumé à ajouter.
 
         """
-        return [a for a in self.abstracts if a.section_number == number]
+        self.abstracts.append(abstract)
+
+        code = abstract.code
+        if code in self.abstracts_by_code:
+            self.logger.warning("Le code \"{code}\" du résumé \
+\"{abstract}\" est déjà utilisé, seul le premier résumé portant ce code sera \
+utilisé".format(
+                code=code,
+                abstract=abstract
+                ))
+
+        else:
+            self.abstracts_by_code[code] = abstract
+
+        self.logger.debug("Ajoute le résumé \"{abstract}\" au \
+contrôleur".format(abstract=abstract))
 
     def _get_abstract_by_code(self, code):
         """Retourne un résumé par son code.
@@ -352,11 +447,7 @@ associé à une thèse".format(
             :obj:`Abstract`: résumé correspondant.
 
         """
-        for abstract in self.abstracts:
-            if abstract.code == code:
-                return abstract
-
-        return None
+        return self.abstracts_by_code.get(code)
 
     def _create_directory_picture_link(self, directory_booklet):
         """Fait le lien du dossier de photos dans le dossier de sortie.
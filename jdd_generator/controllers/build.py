@@ -0,0 +1,398 @@
+#-*- coding: utf8 -*-
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+import os
+import logging
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from ConfigParser import Error as ConfigError
+
+from .jdd import BasicController, JddController, OUTPUT_DIRECTORY
+from .planning import (
+        PlanningController,
+        STUDENTS_FILE,
+        REPARTITIONS_FILE,
+        PLANNING_FILE,
+        )
+
+from .booklet import (
+        BookletController,
+        BOOKLET_FILE,
+        ABSTRACT_FILES,
+        PICTURES_DIRECTORY,
+        )
+
+from ..views.jdd import BasicView, TEMPLATE_DIRECTORY, MAIN_TEMPLATE
+from ..views.planning import SESSION_TEMPLATE, PLANNING_TEMPLATE
+from ..views.booklet import SECTION_TEMPLATE, BOOKLET_TEMPLATE
+
+
+# documents qui utilisent chaque template
+# Les templates qui n'y figurent pas peuvent être inclus par tous les autres.
+TEMPLATE_DOCUMENTS = {
+        SESSION_TEMPLATE: ('planning',),
+        PLANNING_TEMPLATE: ('planning',),
+        SECTION_TEMPLATE: ('booklet',),
+        BOOKLET_TEMPLATE: ('booklet',),
+        MAIN_TEMPLATE: (),
+        }
+
+DOCUMENTS = ('planning', 'booklet')
+DOCUMENT_NAMES = {
+        'planning': "le planning",
+        'booklet': "le recueil",
+        }
+
+
+class BuildController(BasicController):
+    """Contrôleur pour la génération de tous les documents en une fois.
+
+    Le contrôleur pilote un `PlanningController` et un `BookletController`
+    dans le même processus. Les fichiers d'entrée communs aux deux (listing des
+    doctorants et répartitions) ne sont lus qu'une fois, et les deux documents
+    sont construits puis écrits simultanément. Le fichier principal n'est écrit
+    qu'une seule fois, à la fin.
+
+    La durée de chaque étape est mesurée et affichée à la fin de la
+    génération.
+
+    Le contrôleur peut rester en mémoire pour regénérer les documents quand
+    leurs fichiers d'entrée changent (voir les méthodes `update` et `reload`).
+
+    Attributes:
+        logger (:obj:`logging.Logger`): logger pour toute la classe.
+        options (dict): paramètres passés aux contrôleurs des documents.
+        inputs (dict): fichiers d'entrée passés à `create`.
+        planning (:obj:`PlanningController`): contrôleur du planning.
+        booklet (:obj:`BookletController`): contrôleur du recueil.
+        stale (set): documents dont la dernière création a échoué, à
+            reconstruire au prochain rechargement.
+        timings (:obj:`collections.OrderedDict`): durée en secondes de chaque
+            étape.
+        summary (dict): nombre de fichiers et d'octets écrits et inchangés
+            lors de la dernière écriture.
+        changes (dict): codes ajoutés, supprimés et modifiés de chaque listing
+            lors de la dernière écriture incrémentale.
+
+    """
+    logger = logging.getLogger('controllers.build.BuildController')
+
+    def __init__(self, **kwargs):
+        super(BuildController, self).__init__(**kwargs)
+        self.options = kwargs
+        self.inputs = {}
+        self.planning = PlanningController(**kwargs)
+        self.booklet = BookletController(**kwargs)
+        self.stale = set()
+        self.timings = OrderedDict()
+        self.summary = dict(self.write_summary)
+        self.changes = {}
+
+    def create(self, planning_file=PLANNING_FILE, students_file=STUDENTS_FILE,
+            repartitions_file=REPARTITIONS_FILE, booklet_file=BOOKLET_FILE,
+            abstracts_file=ABSTRACT_FILES,
+            directory_pictures=PICTURES_DIRECTORY):
+        """Crée les structures de données du planning et du recueil.
+
+        Args:
+            planning_file (unicode): fichier de configuration des événements
+                du planning.
+            students_file (unicode): fichier de configuration pour charger le
+                listing CSV des doctorants.
+            repartitions_file (unicode): fichier de configuration pour charger
+                le listing CSV des timings.
+            booklet_file (unicode): fichier de configuration pour charger le
+                listing CSV des sections du recueil.
+            abstracts_file (unicode): fichier de configuration pour charger le
+                listing CSV des résumés.
+            directory_pictures (unicode): chemin vers le dossier source des
+                photos.
+
+        """
+        self.inputs = {
+                'planning_file': planning_file,
+                'students_file': students_file,
+                'repartitions_file': repartitions_file,
+                'booklet_file': booklet_file,
+                'abstracts_file': abstracts_file,
+                'directory_pictures': directory_pictures,
+                }
+
+        self._create(DOCUMENTS)
+
+    def retrieve(self, directory=OUTPUT_DIRECTORY):
+        """Écrit le planning, le recueil et le fichier principal.
+
+        Args:
+            directory (unicode): dossier de sortie où enregistrer les fichiers.
+
+        """
+        self._retrieve(DOCUMENTS, directory)
+
+    def update(self, paths, directory=OUTPUT_DIRECTORY):
+        """Regénère les documents qui dépendent de fichiers modifiés.
+
+        Seuls les documents concernés sont reconstruits, les autres gardent
+        leurs données en mémoire. Les fichiers CSV qui n'ont pas changé ne sont
+        pas reparsés (voir `get_shared`). Un chemin inconnu, comme le fichier
+        de config, concerne tous les documents.
+
+        Args:
+            paths (list of unicode): chemins des fichiers modifiés.
+            directory (unicode): dossier de sortie où enregistrer les fichiers.
+
+        """
+        documents = self.reload(paths)
+        self.logger.info("Regénère {documents}".format(
+            documents=" et ".join(
+                DOCUMENT_NAMES[document] for document in documents
+                ) or "le fichier principal"
+            ))
+
+        self._retrieve(documents, directory)
+
+    def reload(self, paths):
+        """Reconstruit les données des documents qui dépendent de fichiers
+        modifiés, sans les écrire.
+
+        Les documents dont la dernière création a échoué sont aussi
+        reconstruits.
+
+        Args:
+            paths (list of unicode): chemins des fichiers modifiés.
+
+        Returns:
+            list of unicode: noms des documents reconstruits.
+
+        """
+        dependencies = self.dependencies()
+        affected = set(self.stale)
+        for path in paths:
+            affected.update(dependencies.get(os.path.abspath(path), DOCUMENTS))
+
+        documents = [document for document in DOCUMENTS if document in affected]
+
+        self.timings = OrderedDict()
+
+        # les données des documents concernés sont reconstruites à partir de
+        # contrôleurs neufs
+        if 'planning' in documents:
+            self.planning = PlanningController(**self.options)
+
+        if 'booklet' in documents:
+            self.booklet = BookletController(**self.options)
+
+        self._create(documents)
+
+        return documents
+
+    def validate(self):
+        """Vérifie que les fichiers d'entrée permettent de créer les documents.
+
+        Les documents sont créés par des contrôleurs neufs, sans toucher à
+        ceux qui sont en mémoire ni écrire de fichier. Une erreur lève une
+        exception, les problèmes moins graves sont signalés dans le log.
+
+        """
+        build = BuildController(**self.options)
+        build.inputs = self.inputs
+        build._create(DOCUMENTS)
+        self.timings = build.timings
+
+    def retrieve_session(self, number, directory=OUTPUT_DIRECTORY):
+        """Écrit le fichier d'une seule session du planning.
+
+        Args:
+            number (int): numéro de la session.
+            directory (unicode): dossier de sortie où enregistrer le fichier.
+
+        Returns:
+            unicode: chemin du fichier de la session.
+
+        """
+        self.planning.reset_write_summary()
+
+        start = time.time()
+        file_path = self.planning.retrieve_session(number, directory=directory)
+        self.timings = OrderedDict([
+            ("écriture de la session {}".format(number), time.time() - start),
+            ])
+
+        self.summary = dict(self.planning.write_summary)
+
+        return file_path
+
+    def dependencies(self):
+        """Donne les documents qui dépendent de chaque fichier d'entrée.
+
+        Les fichiers d'entrée sont les fichiers compagnons passés à `create`,
+        les fichiers CSV qu'ils désignent, le dossier des photos et les
+        templates.
+
+        Returns:
+            dict: noms des documents indexés par chemin absolu de fichier.
+
+        """
+        dependencies = {}
+
+        def add(path, documents):
+            dependencies.setdefault(
+                    os.path.abspath(path),
+                    set()
+                    ).update(documents)
+
+        csv_dict = self._csv_dict()
+        for name, documents in (
+                ('planning_file', ('planning',)),
+                ('students_file', DOCUMENTS),
+                ('repartitions_file', DOCUMENTS),
+                ('booklet_file', ('booklet',)),
+                ('abstracts_file', ('booklet',)),
+                ):
+            config_file = self.inputs[name]
+
+            # un fichier compagnon invalide est tout de même surveillé, pour
+            # regénérer les documents une fois corrigé
+            try:
+                paths = csv_dict.files(config_file)
+
+            except (IOError, ValueError, ConfigError):
+                paths = [config_file]
+
+            for path in paths:
+                add(path, documents)
+
+        add(self.inputs['directory_pictures'], ('booklet',))
+
+        for template in BasicView.environment.list_templates():
+            add(
+                    os.path.join(TEMPLATE_DIRECTORY, template),
+                    TEMPLATE_DOCUMENTS.get(template, DOCUMENTS)
+                    )
+
+        return dependencies
+
+    def _create(self, documents):
+        """Crée les structures de données de certains documents.
+
+        Args:
+            documents (list of unicode): noms des documents à créer.
+
+        """
+        stages = {
+            'planning': ("lecture du planning", lambda: self.planning.create(
+                planning_file=self.inputs['planning_file'],
+                students_file=self.inputs['students_file'],
+                repartitions_file=self.inputs['repartitions_file']
+                )),
+            'booklet': ("lecture du recueil", lambda: self.booklet.create(
+                booklet_file=self.inputs['booklet_file'],
+                abstracts_file=self.inputs['abstracts_file'],
+                students_file=self.inputs['students_file'],
+                repartitions_file=self.inputs['repartitions_file'],
+                directory_pictures=self.inputs['directory_pictures']
+                )),
+            }
+
+        # si la création échoue, les documents seront reconstruits au prochain
+        # rechargement
+        self.stale.update(documents)
+
+        # la lecture des fichiers CSV se fait sur plusieurs processus si `jobs`
+        # est supérieur à 1, il vaut mieux alors ne pas la lancer depuis des
+        # threads
+        self._run(
+                [stages[document] for document in documents],
+                threads=self.jobs <= 1
+                )
+        self.stale.difference_update(documents)
+
+    def _retrieve(self, documents, directory):
+        """Écrit certains documents, puis le fichier principal.
+
+        Args:
+            documents (list of unicode): noms des documents à écrire.
+            directory (unicode): dossier de sortie où enregistrer les fichiers.
+
+        """
+        for document in documents:
+            getattr(self, document).reset_write_summary()
+
+        stages = {
+            'planning': ("écriture du planning",
+                lambda: self.planning.retrieve(directory=directory)),
+            'booklet': ("écriture du recueil",
+                lambda: self.booklet.retrieve(directory=directory)),
+            }
+
+        # les vues rendent sur plusieurs processus si `jobs` est supérieur à
+        # 1, il vaut mieux alors ne pas les lancer depuis des threads
+        self._run(
+                [stages[document] for document in documents],
+                threads=self.jobs <= 1
+                )
+
+        jdd = JddController(incremental=self.incremental)
+        self._run([
+            ("écriture du fichier principal",
+                lambda: jdd.retrieve(directory=directory)),
+            ])
+
+        self._log_timings()
+        self.summary = self.log_write_summary(
+                jdd,
+                *[getattr(self, document) for document in documents]
+                )
+
+        self.changes = self.detect_changes(
+                directory,
+                *[getattr(self, document) for document in documents]
+                )
+
+    def _run(self, stages, threads=True):
+        """Exécute des étapes simultanément et mesure leur durée.
+
+        Les étapes sont exécutées dans des threads. Si l'une d'elles lève une
+        exception, celle-ci est relevée une fois toutes les étapes terminées.
+
+        Args:
+            stages (:obj:`list` of tuple): nom et fonction de chaque étape.
+            threads (bool): si faux, les étapes sont exécutées l'une après
+                l'autre.
+
+        """
+        def run_stage(stage):
+            name, function = stage
+            start = time.time()
+            function()
+            return name, time.time() - start
+
+        # une seule étape n'a pas besoin de thread
+        if len(stages) <= 1 or not threads:
+            results = [run_stage(stage) for stage in stages]
+
+        else:
+            pool = ThreadPool(len(stages))
+            try:
+                results = pool.map(run_stage, stages)
+
+            finally:
+                pool.close()
+                pool.join()
+
+        for name, duration in results:
+            self.timings[name] = duration
+
+    def _log_timings(self):
+        """Affiche la durée de chaque étape.
+
+        """
+        for name, duration in self.timings.iteritems():
+            self.logger.info("Durée de l'étape « {name} » : {duration:.3f} \
+s".format(
+                name=name,
+                duration=duration
+                ))
@@ -4,15 +4,48 @@ from __future__ import absolute_import
 
 import logging
 import os
+import re
+import sys
+import json
+import hashlib
+import threading
 from codecs import open
+from tempfile import NamedTemporaryFile
 
 from ..views.jdd import JddView
-from ..utils.csv_dict import CSVDict
+from ..utils.csv_dict import (
+        CSVDict,
+        make_extractor,
+        booleans_state,
+        hash_rows,
+        iter_hashed_rows,
+        compare_hashes,
+        )
 from ..config import config
 from ..models.jdd import Student, PhD, Supervizor, Director
 
 
 OUTPUT_DIRECTORY = 'jdd'
+CACHE_DIRECTORY = '.cache'
+MANIFEST_FILE = '.manifest.json'
+ROWS_STATE_FILE = '.rows-{name}.json'
+HASH_BLOCK_SIZE = 64 * 1024
+
+# masque des droits des fichiers créés
+# Les fichiers temporaires sont créés avec des droits restreints, on leur donne
+# ceux d'un fichier ordinaire avant de les renommer.
+UMASK = os.umask(0)
+os.umask(UMASK)
+STUDENTS_TYPES = {'come': 'bool'}
+SLOT_PATTERN = re.compile(r'^(?P<prefix>[sd])(?P<number>\d+)-(?P<attribute>.+)$')
+SUPERVIZOR_ATTRIBUTES = ('title', 'name', 'origin', 'department', 'unit')
+DIRECTOR_ATTRIBUTES = ('title', 'name', 'origin')
+
+# données déjà construites, partagées par tous les contrôleurs du processus
+# Pour chaque nom, on garde un verrou, la signature des fichiers et de la
+# configuration dont les données sont issues, et les données elles-mêmes.
+SHARED_REGISTRY = {}
+SHARED_REGISTRY_LOCK = threading.Lock()
 
 
 class BasicController(object):
@@ -26,10 +59,140 @@ class BasicController(object):
 
     Attributes:
         logger (:obj:`logging.Logger`): logger pour toute la classe.
+        cache_directory (unicode): dossier du cache des fichiers CSV parsés, ou
+            `None` pour ne pas utiliser de cache.
+        jobs (int): nombre de processus utilisés pour les traitements
+            parallélisables.
+        incremental (bool): si vrai, seuls les fichiers dont les données
+            d'entrée ont changé depuis la dernière génération sont rendus.
+        write_summary (dict): nombre de fichiers et d'octets écrits ou laissés
+            inchangés par `_write`.
+        sources (dict): en génération incrémentale, hash du contenu des
+            lignes de chaque listing indexé par code qui a été lu, par fichier
+            de configuration. Les lignes modifiées de ces listings sont
+            signalées par `detect_changes`.
+
+    Args:
+        cache_directory (unicode): dossier du cache des fichiers CSV parsés.
+            Par défaut, aucun cache n'est utilisé.
+        jobs (int): nombre de processus utilisés pour les traitements
+            parallélisables. Par défaut, tout se fait dans le processus
+            courant.
+        incremental (bool): active la génération incrémentale. Par défaut,
+            tous les fichiers sont rendus.
 
     """
     logger = logging.getLogger('controllers.jdd.BasicController')
 
+    def __init__(self, cache_directory=None, jobs=1, incremental=False):
+        self.cache_directory = cache_directory
+        self.jobs = jobs
+        self.incremental = incremental
+        self.sources = {}
+        self.reset_write_summary()
+
+    def reset_write_summary(self):
+        """Remet à zéro le nombre de fichiers écrits et inchangés.
+
+        """
+        self.write_summary = {
+                'written': 0,
+                'written_bytes': 0,
+                'unchanged': 0,
+                'unchanged_bytes': 0,
+                }
+
+    def _csv_dict(self):
+        """Crée un lecteur de fichier CSV avec les paramètres du contrôleur.
+
+        Returns:
+            :obj:`CSVDict`: lecteur de fichier CSV.
+
+        """
+        return CSVDict(cache_directory=self.cache_directory, jobs=self.jobs)
+
+    def _index_csv(self, config_file, field='code', types=None, last=False):
+        """Lit un fichier CSV et indexe ses lignes par la valeur d'un champ.
+
+        Les valeurs présentes plusieurs fois dans le fichier sont signalées, et
+        seule la première ligne qui porte chacune d'entre elles est gardée, ou
+        la dernière si `last` est vrai.
+
+        Args:
+            config_file (unicode): fichier de configuration pour charger le
+                fichier CSV.
+            field (unicode): champ servant de clé, par défaut le code.
+            types (dict): type par défaut de certains champs.
+            last (bool): si vrai, garde la dernière ligne de chaque valeur.
+
+        Returns:
+            :obj:`CSVIndex`: index des lignes du fichier. Il doit être fermé
+            une fois parcouru, pour libérer les lignes lues avec les backends
+            `mmap` et `sqlite`.
+
+        """
+        def build():
+            csv_dict = self._csv_dict()
+            csv_dict.read(config_file, types)
+
+            # en cas d'erreur, les lignes ne sont pas rendues et doivent donc
+            # être libérées ici
+            try:
+                index = csv_dict.index_by(field, last=last)
+
+                # le contenu des lignes n'est hashé que pour détecter les
+                # modifications en génération incrémentale
+                if self.incremental and field == 'code':
+                    hashes = hash_rows(index.rows, field)
+
+                else:
+                    hashes = None
+
+            except Exception:
+                csv_dict.close()
+                raise
+
+            for key, positions in index.duplicates.iteritems():
+                self.logger.warning("La valeur \"{key}\" du champ \
+\"{field}\" apparaît {amount} fois dans \"{file}\", seule la {which} ligne \
+est utilisée".format(
+                    key=key,
+                    field=field,
+                    amount=len(positions),
+                    file=config_file,
+                    which="dernière" if last else "première"
+                    ))
+
+            # seules les lignes entièrement chargées en mémoire peuvent être
+            # partagées entre les threads
+            return (index, hashes), isinstance(index.rows, list)
+
+        # l'index est partagé entre les contrôleurs tant que le fichier ne
+        # change pas
+        name = (
+                'index',
+                os.path.abspath(config_file),
+                field,
+                tuple(sorted((types or {}).items())),
+                last,
+                )
+
+        key = (
+                self._csv_dict().signature(config_file),
+                booleans_state(),
+                self.incremental,
+                )
+
+        (index, hashes), reused = get_shared(name, key, build)
+        if reused:
+            self.logger.debug("Réutilise l'index déjà construit depuis \
+\"{file}\"".format(file=config_file))
+
+        if hashes is not None:
+            self.sources[config_file] = hashes
+
+        return index
+
     def _get_phds(self, students_file):
         """Récupère les thèses depuis la liste des doctorants.
 
@@ -37,6 +200,11 @@ class BasicController(object):
         des résumés courts, elle a donc été mutualisée dans la plus proche
         classe parente de `PlanningController` et de `BookletController`.
 
+        Les thèses sont construites une seule fois par processus et partagées
+        entre les contrôleurs, tant que le listing et la configuration ne
+        changent pas. Elles ne doivent donc pas être modifiées : un contrôleur
+        qui a besoin de modifier une thèse doit d'abord la copier.
+
         Args:
             students_file (unicode): fichier de configuration pour charger la
                 liste CSV des doctorants, qui doit contenir les sujets, les
@@ -53,20 +221,73 @@ class BasicController(object):
             }
 
         """
-        # lire le fichier CSV
-        students = CSVDict()
-        students.read(students_file)
+        key = (
+                self._csv_dict().signature(students_file),
+                tuple((s, tuple(config.items(s))) for s in config.sections()),
+                self.incremental,
+                )
+
+        def build():
+            # le contenu des lignes n'est hashé que pour détecter les
+            # modifications en génération incrémentale
+            hashes = {} if self.incremental else None
+            return (self._create_phds(students_file, hashes), hashes), True
+
+        (phds, hashes), reused = get_shared(
+                ('phds', os.path.abspath(students_file)),
+                key,
+                build
+                )
+
+        if reused:
+            self.logger.debug("Réutilise les thèses déjà construites depuis \
+\"{file}\"".format(file=students_file))
+
+        if hashes is not None:
+            self.sources[students_file] = hashes
+
+        return list(phds)
+
+    def _create_phds(self, students_file, hashes=None):
+        """Construit les thèses depuis la liste des doctorants.
+
+        Args:
+            students_file (unicode): fichier de configuration pour charger la
+                liste CSV des doctorants.
+            hashes (dict): si donné, complété par le hash du contenu des
+                lignes pour chaque code.
+
+        Returns:
+            :obj:`list` of tuple: voir `_get_phds`.
+
+        """
+        # lire le fichier CSV au fil de l'eau
+        students = self._csv_dict().iter_rows(students_file, STUDENTS_TYPES)
+        if hashes is not None:
+            students = iter_hashed_rows(students, 'code', hashes)
 
         # créer les objets
         phds = []
 
+        # emplacements des encadrants et des directeurs
+        # Ils sont déduits des champs à la première ligne, puis réutilisés.
+        supervizor_slots = None
+        director_slots = None
+
         # lire chaque ligne
         # On lit les lignes du fichier qui liste les doctorants avec leur sujet
         # et leur encadrants/directeurs. On considère que chaque ligne donne
         # une présentation.
         for line in students:
+            if supervizor_slots is None:
+                supervizor_slots = compile_slots(line.keys(), 's',
+                        SUPERVIZOR_ATTRIBUTES)
+
+                director_slots = compile_slots(line.keys(), 'd',
+                        DIRECTOR_ATTRIBUTES)
+
             # flag pour indiquer si la thèse sera présentée
-            come_flag = config.getboolean('booleans', line['come'].lower())
+            come_flag = bool(line['come'])
 
             # code
             code = line['code']
@@ -86,54 +307,31 @@ class BasicController(object):
                     )
 
             # encadrants
-            # On charge tous les encadrants possibles. Comme on ne connait pas
-            # leur nombre, on utilise une boucle infinie. Ceci marche car les
-            # champs concernant les encadrants dans le fichier de configuration
-            # sont préfixés du numéro d'encadrant : `s1-name` avec `s` pour
-            # "supervizor".
+            # Les champs concernant les encadrants dans le fichier de
+            # configuration sont préfixés du numéro d'encadrant : `s1-name`
+            # avec `s` pour "supervizor". On s'arrête au premier encadrant dont
+            # le nom est vide.
             supervizors = []
-            i = 0
-            while True:
-                prefix = 's{}-'.format(i)
-
-                # on vérifie que le nom de l'encadrant existe et n'est pas vide
-                if prefix + "name" not in line or \
-                        not line[prefix + "name"]:
-                            break
-
-                # dans ce cas ajouter l'encadrant
-                supervizors.append(Supervizor(
-                    title=line[prefix + 'title'],
-                    name=line[prefix + 'name'].title(),
-                    origin=line[prefix + 'origin'],
-                    department=line[prefix + 'department'],
-                    unit=line[prefix + 'unit']
-                    ))
+            for name_position, extract in supervizor_slots:
+                if not line[name_position]:
+                    break
 
-                i += 1
+                values = dict(zip(SUPERVIZOR_ATTRIBUTES, extract(line)))
+                values['name'] = values['name'].title()
+                supervizors.append(Supervizor(**values))
 
             # directeurs
             # Même logique que pour les encadrants.  Sauf que les champs
             # concernant les directeurs sont préfixés par `d`, pour "director" :
             # `d1-name`.
             directors = []
-            i = 0
-            while True:
-                prefix = 'd{}-'.format(i)
-
-                # on vérifie que le nom du directeur existe et n'est pas vide
-                if prefix + "name" not in line or \
-                        not line[prefix + "name"]:
-                            break
-
-                # dans ce cas ajouter le directeur
-                directors.append(Director(
-                    title=line[prefix + 'title'],
-                    name=line[prefix + 'name'].title(),
-                    origin=line[prefix + 'origin']
-                    ))
+            for name_position, extract in director_slots:
+                if not line[name_position]:
+                    break
 
-                i += 1
+                values = dict(zip(DIRECTOR_ATTRIBUTES, extract(line)))
+                values['name'] = values['name'].title()
+                directors.append(Director(**values))
 
             # thèse
             phd = PhD(
@@ -158,9 +356,48 @@ class BasicController(object):
 
         return phds
 
+    def _group(self, items, attribute, numbers):
+        """Répartit des éléments selon leur numéro en un seul parcours.
+
+        Chaque groupe est trié par l'ordre des éléments. Les éléments dont le
+        numéro ne correspond à aucun de ceux attendus sont mis à part.
+
+        Args:
+            items (list): éléments à répartir, qui ont un attribut `order`.
+            attribute (unicode): nom de l'attribut qui donne le numéro.
+            numbers (list of int): numéros attendus.
+
+        Returns:
+            tuple: dictionnaire des listes d'éléments triés pour chaque numéro
+            attendu, et liste des éléments restants.
+
+        """
+        groups = {number: [] for number in numbers}
+        orphans = []
+        for item in items:
+            group = groups.get(getattr(item, attribute))
+            if group is None:
+                orphans.append(item)
+
+            else:
+                group.append(item)
+
+        for group in groups.itervalues():
+            group.sort(key=lambda i: i.order)
+
+        return groups, orphans
+
     def _write(self, text, directory):
         """Écrit une liste de données formatées dans un fichier texte.
 
+        Le contenu peut être un texte ou une suite de morceaux de texte
+        produits au fil du rendu. Il est écrit morceau par morceau dans un
+        fichier temporaire du même dossier, sans jamais être gardé en mémoire
+        en entier, et son empreinte est calculée au passage. Si le fichier
+        existant a le même contenu, il n'est pas touché, pour garder sa date de
+        modification. Sinon, le fichier temporaire le remplace, ce qui ne
+        laisse jamais un fichier à moitié écrit.
+
         Args:
             text (:obj:`dict`): dictionnaire contenant le non de
                 fichier et le contenu texte.
@@ -182,13 +419,216 @@ class BasicController(object):
         file_name = text['file_name']
         file_path = os.path.join(directory, file_name)
 
-        # écrire
-        with open(file_path, 'w', encoding='utf8') as file:
-            file.write(text['text'])
-            self.logger.info("Écris le fichier \"{file}\"".format(
+        # en mode incrémental, les fichiers à jour ne sont pas rendus
+        if text['text'] is None:
+            self.logger.info("Le fichier \"{file}\" est à jour".format(
                 file=file_path
                 ))
 
+            self._count_write('unchanged', os.path.getsize(file_path))
+
+            return
+
+        chunks = text['text']
+        if isinstance(chunks, unicode):
+            chunks = [chunks]
+
+        # écrire dans un fichier temporaire en calculant l'empreinte
+        digest = hashlib.sha1()
+        size = 0
+        with NamedTemporaryFile(dir=directory, delete=False) as file:
+            try:
+                for chunk in chunks:
+                    data = chunk.encode('utf8')
+                    digest.update(data)
+                    size += len(data)
+                    file.write(data)
+
+            except:
+                file.close()
+                os.remove(file.name)
+                raise
+
+        # ne pas toucher aux fichiers identiques
+        if is_same_content(file_path, size, digest.digest()):
+            os.remove(file.name)
+            self.logger.info("Le fichier \"{file}\" n'a pas changé".format(
+                file=file_path
+                ))
+
+            self._count_write('unchanged', size)
+
+            return
+
+        os.chmod(file.name, 0o666 & ~UMASK)
+        os.rename(file.name, file_path)
+        self.logger.info("Écris le fichier \"{file}\"".format(
+            file=file_path
+            ))
+
+        self._count_write('written', size)
+
+    def _count_write(self, kind, size):
+        """Compte un fichier écrit ou inchangé.
+
+        Args:
+            kind (unicode): `written` ou `unchanged`.
+            size (int): taille du fichier en octets.
+
+        """
+        self.write_summary[kind] += 1
+        self.write_summary[kind + '_bytes'] += size
+
+    def log_write_summary(self, *controllers):
+        """Affiche le nombre de fichiers écrits et inchangés.
+
+        Args:
+            *controllers: autres contrôleurs dont les écritures sont ajoutées
+                à celles de ce contrôleur.
+
+        Returns:
+            dict: nombre de fichiers et d'octets écrits et inchangés.
+
+        """
+        summary = dict(self.write_summary)
+        for controller in controllers:
+            for key, value in controller.write_summary.iteritems():
+                summary[key] += value
+
+        self.logger.info("Écris {written} fichiers ({written_bytes} octets), \
+{unchanged} fichiers inchangés ({unchanged_bytes} octets)".format(**summary))
+
+        return summary
+
+    def detect_changes(self, directory, *controllers):
+        """Affiche les codes ajoutés, supprimés et modifiés dans les listings.
+
+        Seulement en génération incrémentale. Le hash des lignes de chaque
+        listing, calculé pendant sa lecture, est comparé à celui de la
+        génération précédente, gardé dans un fichier d'état du dossier de
+        sortie. Rien n'est affiché pour un listing qui n'a pas encore de
+        fichier d'état.
+
+        Args:
+            directory (unicode): dossier de sortie où garder les fichiers
+                d'état.
+            *controllers: autres contrôleurs dont les listings sont ajoutés à
+                ceux de ce contrôleur.
+
+        Returns:
+            dict: codes ajoutés, supprimés et modifiés de chaque listing,
+            indexés par fichier de configuration.
+
+        """
+        if not self.incremental:
+            return {}
+
+        sources = dict(self.sources)
+        for controller in controllers:
+            sources.update(controller.sources)
+
+        changes = {}
+        for config_file, hashes in sorted(sources.iteritems()):
+            state_file = os.path.join(directory, ROWS_STATE_FILE.format(
+                name=os.path.splitext(os.path.basename(config_file))[0]
+                ))
+
+            known = os.path.isfile(state_file)
+
+            file_changes = compare_hashes(hashes, state_file)
+            changes[config_file] = file_changes._asdict()
+
+            if not known:
+                continue
+
+            for codes, kind in (
+                    (file_changes.added, "ajoutés"),
+                    (file_changes.removed, "supprimés"),
+                    (file_changes.changed, "modifiés"),
+                    ):
+                if not codes:
+                    continue
+
+                self.logger.info("Codes {kind} dans \"{file}\" depuis la \
+dernière génération : {codes}".format(
+                    kind=kind,
+                    file=config_file,
+                    codes=", ".join(codes)
+                    ))
+
+        return changes
+
+    def _read_manifest(self, directory):
+        """Lit le manifeste des fichiers générés dans un dossier.
+
+        Le manifeste garde, pour chaque fichier généré, l'empreinte de ses
+        données d'entrée. Les fichiers qui ont disparu du dossier sont ignorés,
+        pour être générés à nouveau.
+
+        Args:
+            directory (unicode): dossier des fichiers générés.
+
+        Returns:
+            dict: empreintes des fichiers indexées par nom de fichier, ou
+            `None` si la génération n'est pas incrémentale.
+
+        """
+        if not self.incremental:
+            return None
+
+        manifest_path = os.path.join(directory, MANIFEST_FILE)
+        if not os.path.isfile(manifest_path):
+            return {}
+
+        try:
+            with open(manifest_path, 'r', encoding='utf8') as file:
+                manifest = json.load(file)
+
+        except ValueError:
+            self.logger.warning("Le manifeste \"{file}\" est illisible, tous \
+les fichiers sont générés à nouveau".format(file=manifest_path))
+
+            return {}
+
+        return dict(
+                (file_name, digest)
+                for file_name, digest in manifest.iteritems()
+                if os.path.isfile(os.path.join(directory, file_name))
+                )
+
+    def _write_manifest(self, files_content, directory, merge=False):
+        """Écrit le manifeste des fichiers générés dans un dossier.
+
+        Args:
+            files_content (:obj:`list` of :obj:`dict`): fichiers générés, avec
+                l'empreinte de leurs données d'entrée.
+            directory (unicode): dossier des fichiers générés.
+            merge (bool): si vrai, les fichiers sont ajoutés au manifeste
+                existant plutôt que de le remplacer.
+
+        """
+        if not self.incremental:
+            return
+
+        if isinstance(files_content, dict):
+            files_content = [files_content]
+
+        manifest = self._read_manifest(directory) if merge else {}
+        manifest.update(
+                (content['file_name'], content['digest'])
+                for content in files_content
+                )
+
+        # on écrit dans un fichier temporaire puis on le renomme, pour ne
+        # jamais laisser un manifeste à moitié écrit
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with NamedTemporaryFile(dir=directory, delete=False) as file:
+            json.dump(manifest, file, sort_keys=True, indent=0)
+
+        os.rename(file.name, os.path.join(directory, MANIFEST_FILE))
+
     def _write_texts(self, texts, directory):
         """Écrit une liste de données formatées dans un fichier texte.
 
@@ -203,6 +643,123 @@ class BasicController(object):
             self._write_text(text, directory)
 
 
+def get_shared(name, key, build):
+    """Donne des données partagées entre les contrôleurs du processus.
+
+    Les données sont construites au premier appel, puis réutilisées tant que
+    la clé ne change pas. Chaque nom a son propre verrou : un contrôleur qui
+    demande des données en cours de construction par un autre thread attend
+    qu'elles soient prêtes plutôt que de les construire à nouveau.
+
+    Args:
+        name (tuple): nom des données dans le registre.
+        key (tuple): signature des fichiers et de la configuration dont les
+            données sont issues.
+        build (:obj:`function`): fonction qui construit les données et
+            indique si elles peuvent être partagées.
+
+    Returns:
+        tuple: données, et `True` si elles ont été réutilisées.
+
+    """
+    with SHARED_REGISTRY_LOCK:
+        entry = SHARED_REGISTRY.setdefault(name, [threading.Lock(), None, None])
+
+    lock = entry[0]
+    with lock:
+        if entry[1] is not None and entry[1] == key:
+            return entry[2], True
+
+        value, shareable = build()
+        if shareable:
+            entry[1:] = [key, value]
+
+        else:
+            entry[1:] = [None, None]
+
+        return value, False
+
+
+def is_same_content(file_path, size, sha1):
+    """Indique si un fichier a déjà un contenu donné.
+
+    Les tailles sont comparées en premier, le contenu n'est lu que si elles
+    sont égales.
+
+    Args:
+        file_path (unicode): chemin du fichier.
+        size (int): taille en octets du contenu attendu.
+        sha1 (str): empreinte SHA-1 du contenu attendu.
+
+    Returns:
+        bool: vrai si le fichier existe et a ce contenu.
+
+    """
+    try:
+        if os.path.getsize(file_path) != size:
+            return False
+
+    except OSError:
+        return False
+
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+
+    return digest.digest() == sha1
+
+
+def compile_slots(fields, prefix, attributes):
+    """Prépare l'extraction des encadrants ou des directeurs d'une ligne.
+
+    Les champs d'un emplacement sont de la forme `{prefix}{numéro}-{attribut}`,
+    par exemple `s0-name`. Les emplacements sont numérotés à partir de 0 et
+    seuls ceux qui se suivent sans trou et qui ont un champ `name` sont gardés,
+    quel que soit leur nombre.
+
+    Args:
+        fields (list of unicode): noms des champs, dans l'ordre de la ligne.
+        prefix (unicode): préfixe des champs, `s` ou `d`.
+        attributes (tuple of unicode): attributs à extraire pour chaque
+            emplacement.
+
+    Returns:
+        :obj:`list` of tuple: pour chaque emplacement, la position du champ
+        `name` dans la ligne et la fonction qui extrait les valeurs des
+        attributs, dans l'ordre de `attributes`.
+
+    """
+    # positions des champs de chaque emplacement
+    slots = {}
+    for position, field in enumerate(fields):
+        match = SLOT_PATTERN.match(field)
+        if match is None or match.group('prefix') != prefix:
+            continue
+
+        slots.setdefault(int(match.group('number')), {})[
+                match.group('attribute')] = position
+
+    compiled = []
+    number = 0
+    while 'name' in slots.get(number, {}):
+        positions = slots[number]
+        missing = [a for a in attributes if a not in positions]
+        if missing:
+            raise ValueError("Les champs {fields} sont absents du fichier \
+compagnon".format(
+                fields=', '.join(
+                    '{}{}-{}'.format(prefix, number, a) for a in missing
+                    )
+                ).encode(sys.stderr.encoding))
+
+        extract = make_extractor([positions[a] for a in attributes])
+        compiled.append((positions['name'], extract))
+        number += 1
+
+    return compiled
+
+
 class JddController(BasicController):
     """Contrôleur pour la génération du fichier principal.
 
@@ -225,8 +782,9 @@ class JddController(BasicController):
 
         """
         # créer une vue et récupérer le document
-        view = JddView()
+        view = JddView(manifest=self._read_manifest(directory))
         main = view.retrieve()
 
         # écrire le résulat
         self._write(main, directory)
+        self._write_manifest(main, directory)
@@ -6,6 +6,7 @@ import os
 import sys
 import logging
 from datetime import timedelta, datetime
+from contextlib import closing
 from codecs import open
 
 from ConfigParser import SafeConfigParser
@@ -13,7 +14,6 @@ from colour import Color
 
 from .jdd import BasicController, OUTPUT_DIRECTORY
 from ..utils import utils
-from ..utils.csv_dict import CSVDict
 from ..models.planning import Event, Session, Presentation
 from ..models.jdd import Student, PhD, Supervizor, Director
 from ..views.planning import PlanningView
@@ -23,9 +23,18 @@ from ..config import config
 STUDENTS_FILE = 'listing.ini'
 REPARTITIONS_FILE = 'timings.ini'
 PLANNING_FILE = 'planning.ini'
-DATE_FORMAT = "%Y-%m-%d"
-TIME_FORMAT = "%H:%M"
-DATETIME_FORMAT = DATE_FORMAT + ' ' + TIME_FORMAT
+PLANNING_TYPES = {
+        'number': 'int',
+        'day': 'date',
+        'start': 'time',
+        'stop': 'time',
+        }
+REPARTITIONS_TYPES = {
+        'day': 'int',
+        'session': 'int',
+        'order': 'int',
+        'length': 'int',
+        }
 
 
 class PlanningController(BasicController):
@@ -42,13 +51,17 @@ class PlanningController(BasicController):
         presentations (:obj:`list` of :obj:`Presentation`): liste des
             présentations (n'a pas vraiment de sens en tant qu'attribut, mais ça
             permet de faciliter le passage de cette variable).
+        presentations_by_code (dict): index des présentations par code, tenu à
+            jour par `_add_presentation`.
         events (:obj:`list` of :obj:`Event`): liste des évents.
 
     """
     logger = logging.getLogger('controllers.planning.PlanningController')
 
-    def __init__(self):
+    def __init__(self, **kwargs):
+        super(PlanningController, self).__init__(**kwargs)
         self.presentations = []
+        self.presentations_by_code = {}
         self.events = []
 
     def create(self, planning_file=PLANNING_FILE, students_file=STUDENTS_FILE,
@@ -93,15 +106,53 @@ class PlanningController(BasicController):
             directory (unicode): dossier de sortie où enregistrer les fichiers.
 
         """
+        # dossier pour écrire les fichiers de planning
+        directory_planning = os.path.join(directory, 'planning')
+
         # on crée une vue et lui passe les données
-        view = PlanningView()
+        view = PlanningView(
+                jobs=self.jobs,
+                manifest=self._read_manifest(directory_planning)
+                )
+
         files_content = view.retrieve(self.events)
 
+        # écrire
+        self._write(files_content, directory_planning)
+        self._write_manifest(files_content, directory_planning)
+
+    def retrieve_session(self, number, directory=OUTPUT_DIRECTORY):
+        """Écrit le fichier d'une seule session.
+
+        Args:
+            number (int): numéro de la session.
+            directory (unicode): dossier de sortie où enregistrer le fichier.
+
+        Returns:
+            unicode: chemin du fichier de la session.
+
+        """
+        sessions = [
+                event for event in self.events
+                if isinstance(event, Session) and event.number == number
+                ]
+
+        if not sessions:
+            raise ValueError("La session {number} n'existe pas dans le \
+planning".format(number=number).encode(sys.stderr.encoding))
+
         # dossier pour écrire les fichiers de planning
         directory_planning = os.path.join(directory, 'planning')
 
+        # on crée une vue et lui passe la session
+        view = PlanningView(manifest=self._read_manifest(directory_planning))
+        file_content = view.retrieve_session(sessions[0])
+
         # écrire
-        self._write(files_content, directory_planning)
+        self._write(file_content, directory_planning)
+        self._write_manifest(file_content, directory_planning, merge=True)
+
+        return os.path.join(directory_planning, file_content['file_name'])
 
     def _create_events(self, planning_file):
         """Extraire les données du planning.
@@ -115,9 +166,8 @@ class PlanningController(BasicController):
                 d'autres éléments, ce nécessite un traitement séparé).
 
         """
-        # lire le fichier CSV
-        planning = CSVDict()
-        planning.read(planning_file)
+        # lire le fichier CSV au fil de l'eau
+        planning = self._csv_dict().iter_rows(planning_file, PLANNING_TYPES)
 
         # créer les objets
         self.events = []
@@ -126,32 +176,18 @@ class PlanningController(BasicController):
         for event in planning:
             # extraction de certains paramètres en avance
             # jour de l'évent
-            # On doit convertir les `/` en `-` parce que Libre Office Calc est
-            # un connard qui respecte pas le standard ISO 8601 tout en te
-            # faisant croire qu'il le respecte. Il l'encode avec des `/` au lieu
-            # de `-`.
-            day_str = event['day'].replace('/', '-')
-            day = datetime.strptime(
-                    day_str,
-                    DATE_FORMAT
-                    )
+            # Le jour, le début et la fin sont déjà convertis à la lecture du
+            # fichier CSV (voir `PLANNING_TYPES`).
+            day = event['day']
 
             # début de l'évent
             # On recrée une date complète jour + heure et pas seulement l'heure,
             # c'est plus facile à manipuler avec le module `datetime`.
-            start_str = event['start']
-            start = datetime.strptime(
-                    day_str + ' ' + start_str,
-                    DATETIME_FORMAT
-                    )
+            start = datetime.combine(day, event['start'])
 
             # fin de l'évent
             # même astuce que pour le début de l'évent
-            stop_str = event['stop']
-            stop = datetime.strptime(
-                    day_str + ' ' + stop_str,
-                    DATETIME_FORMAT
-                    )
+            stop = datetime.combine(day, event['stop'])
 
             # couleur du bandeau de l'évent
             # Le module colour permet plusieurs représentations de la couleur,
@@ -170,7 +206,7 @@ class PlanningController(BasicController):
             event_type = event['type'].lower()
             if event_type == 'session':
                 event_object = Session(
-                        number=int(event['number']),
+                        number=event['number'],
                         color=color,
                         day=day,
                         start=start,
@@ -179,10 +215,9 @@ class PlanningController(BasicController):
                         )
 
             else:
-                number = event['number']
                 event_object = Event(
                         name=event['type'].title(),
-                        number=int(number) if number else 0,
+                        number=event['number'] or 0,
                         color=color,
                         day=day,
                         start=start,
@@ -206,6 +241,7 @@ class PlanningController(BasicController):
         """
         # initialiser les présentations
         self.presentations = []
+        self.presentations_by_code = {}
 
         # obtenir la liste des thèses depuis le fichier de listing des
         # doctorants
@@ -226,11 +262,7 @@ class PlanningController(BasicController):
             presentation.set_phd(phd)
 
             # sauver
-            self.presentations.append(presentation)
-            self.logger.debug("Ajoute la présentation \
-\"{presentation}\" au contrôleur".format(
-                presentation=presentation
-                ))
+            self._add_presentation(presentation)
 
     def _apply_repartitions(self, repartitions_file):
         """Extraire les données de repartitions.
@@ -240,48 +272,50 @@ class PlanningController(BasicController):
                 la liste CSV des repartitions, qui contient l'affectation de
                 chaque présentation dans les sessions.
         """
-        # lire les fichiers CSV
-        repartitions = CSVDict()
-        repartitions.read(repartitions_file)
-
-        # parcours de chaque timing
-        # On lit les lignes du fichier des repartitions. Le fichier doit avoir une
-        # ligne par présentation. On repère les présentations avec le code.
-        for timing in repartitions:
-            # on récupère la présentation correspondante avec le code
-            code = timing['code']
-            presentation = self._get_presentation_by_code(code)
-
-            # Si aucune présentation ne correspond au code, logger l'erreur et
-            # continuer.
-            if presentation is None:
-                self.logger.warning("La ligne de répartiton des timings \
+        # lire le fichier CSV, indexé par code
+        # Comme avant l'indexation, la dernière ligne d'un code présent
+        # plusieurs fois l'emporte.
+        with closing(self._index_csv(repartitions_file,
+                types=REPARTITIONS_TYPES, last=True)) as repartitions:
+            # parcours de chaque timing
+            # On lit les lignes du fichier des repartitions. Le fichier doit
+            # avoir une ligne par présentation. On repère les présentations
+            # avec le code.
+            for timing in repartitions.itervalues():
+                # on récupère la présentation correspondante avec le code
+                code = timing['code']
+                presentation = self._get_presentation_by_code(code)
+
+                # Si aucune présentation ne correspond au code, logger l'erreur
+                # et continuer.
+                if presentation is None:
+                    self.logger.warning("La ligne de répartiton des timings \
 \"{code}\" ne correspond à aucune présentation".format(
-                    code=code
-                    ))
+                        code=code
+                        ))
 
-                continue
+                    continue
 
-            # Si la présentation n'est affiliée à aucun jour, logger l'erreur et
-            # continuer.
-            if not timing['day']:
-                self.logger.error("La ligne de timing \"{code}\" \
+                # Si la présentation n'est affiliée à aucun jour, logger
+                # l'erreur et continuer.
+                if timing['day'] is None:
+                    self.logger.error("La ligne de timing \"{code}\" \
 n'est attribuée à aucun jour".format(
-                    code=code
-                    ))
+                        code=code
+                        ))
 
-                continue
+                    continue
 
-            # ajouter les infos de timing à la présentation
-            presentation.day = int(timing['day'])
-            presentation.session_number = int(timing['session'])
-            presentation.order = int(timing['order'])
-            presentation.duration = timedelta(
-                    minutes=int(timing['length'])
-                    )
+                # ajouter les infos de timing à la présentation
+                presentation.day = timing['day']
+                presentation.session_number = timing['session']
+                presentation.order = timing['order']
+                presentation.duration = timedelta(
+                        minutes=timing['length']
+                        )
 
-            self.logger.debug("Ajoute les infos de timing à la présentation \
-\"{presentation}\"".format(presentation=presentation))
+                self.logger.debug("Ajoute les infos de timing à la \
+présentation \"{presentation}\"".format(presentation=presentation))
 
     def _sort_events(self):
         """Trier les évents.
@@ -299,19 +333,31 @@ n'est attribuée à aucun jour".format(
         d'ordre, puis leur date de début et de fin leur sont uttribuées.
 
         """
+        # ne sélectionner que les sessions
+        sessions = [e for e in self.events if isinstance(e, Session)]
+
         # répartir les présentations par session et les trier par ordre
-        for session in self.events:
-            # ne sélectionner que les sessions
-            if not isinstance(session, Session):
+        groups, orphans = self._group(
+                self.presentations,
+                'session_number',
+                [session.number for session in sessions]
+                )
+
+        # signaler les présentations attribuées à une session inexistante
+        # Les présentations sans timing gardent le numéro 0 par défaut.
+        for presentation in orphans:
+            if not presentation.session_number:
                 continue
 
-            # récupérer les présentations qui sont associées à cette session
-            presentations = self._get_presentations_by_session_number(
-                    session.number
-                    )
+            self.logger.warning("La présentation \"{presentation}\" est \
+attribuée à la session {number}, qui n'existe pas dans le planning".format(
+                presentation=presentation,
+                number=presentation.session_number
+                ))
 
-            # trier les présentations par ordre
-            presentations.sort(key=lambda p: p.order)
+        for session in sessions:
+            # récupérer les présentations qui sont associées à cette session
+            presentations = groups[session.number]
 
             # affecter les temps aux présentations
             # À présent, entrer les temps de début et de fin de chaque
@@ -340,18 +386,34 @@ n'est attribuée à aucun jour".format(
                         session=session
                         ).encode(sys.stderr.encoding))
 
-    def _get_presentations_by_session_number(self, number):
-        """Retourne une liste de présentations de la même session.
+    def _add_presentation(self, presentation):
+        """Ajoute une présentation au contrôleur et l'indexe par son code.
 
-        Args:
-            number (int): numéro de session.
+        Si le code est déjà utilisé, la présentation est tout de même ajoutée,
+        mais l'index continue de désigner la première présentation.
 
-        Returns:
-            :obj:`list` of :obj:`Presentation`: liste de présentations associées
-            à cette session.
+        Args:
+            presentation (:obj:`Presentation`): présentation à ajouter.
 
         """
-        return [p for p in self.presentations if p.session_number == number]
+        self.presentations.append(presentation)
+
+        code = presentation.code
+        if code in self.presentations_by_code:
+            self.logger.warning("Le code \"{code}\" de la présentation \
+\"{presentation}\" est déjà utilisé, seule la première présentation portant \
+ce code sera utilisée".format(
+                code=code,
+                presentation=presentation
+                ))
+
+        else:
+            self.presentations_by_code[code] = presentation
+
+        self.logger.debug("Ajoute la présentation \
+\"{presentation}\" au contrôleur".format(
+            presentation=presentation
+            ))
 
     def _get_presentation_by_code(self, code):
         """Retourne une présentation par son code.
@@ -363,8 +425,4 @@ n'est attribuée à aucun jour".format(
             :obj:`Presentation`: présentation correspondante.
 
         """
-        for presentation in self.presentations:
-            if presentation.code == code:
-                return presentation
-
-        return None
+        return self.presentations_by_code.get(code)
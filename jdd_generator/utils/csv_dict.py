@@ -6,9 +6,44 @@ import csv
 import os
 import sys
 import string
+import io
+import re
+import logging
+import hashlib
+import json
+import sqlite3
+import cPickle as pickle
+from bisect import bisect_right
+from glob import glob
+from multiprocessing import Pool
+from mmap import mmap, ACCESS_READ
+from array import array
+from tempfile import NamedTemporaryFile
+from collections import Mapping, OrderedDict, namedtuple
+from itertools import islice, chain
+from operator import itemgetter
+from datetime import datetime
 from codecs import open, BOM_UTF8
 
-from ConfigParser import SafeConfigParser
+from ConfigParser import SafeConfigParser, NoOptionError, NoSectionError
+
+from ..config import config
+
+
+CACHE_EXTENSION = '.cache'
+CACHE_VERSION = 4
+INDEX_EXTENSION = '.index'
+BACKEND_CSV = 'csv'
+BACKEND_MMAP = 'mmap'
+BACKEND_SQLITE = 'sqlite'
+PARALLEL_SIZE = 8 * 1024 * 1024
+CONVERTER_CACHE_SIZE = 1024
+DATE_FORMAT = "%Y-%m-%d"
+TIME_FORMAT = "%H:%M"
+FILTER_OPERATORS = ('not in', 'in', '!=', '=')
+
+
+Changes = namedtuple('Changes', ['added', 'removed', 'changed'])
 
 
 class CSVDict:
@@ -32,17 +67,66 @@ class CSVDict:
     Ce qui donne la colonne `column_name` de la première ligne (noter que le
     numéro des lignes commence à 0).
 
+    Pour les gros fichiers, on peut éviter de charger tout le fichier en
+    mémoire en parcourant les lignes au fil de la lecture :
+
+    >>> for line in csv_dict.iter_rows('my_ini_file.ini'):
+    ...     line['column_name']
+
+    Dans ce cas, l'attribut `data` n'est pas rempli.
+
+    Si un dossier de cache est indiqué, les lignes lues sont enregistrées dans
+    ce dossier sous forme binaire. Tant que le fichier CSV et les champs du
+    fichier compagnon ne changent pas, les lectures suivantes chargent les
+    lignes depuis le cache sans reparser le fichier CSV :
+
+    >>> csv_dict = CSVDict(cache_directory='jdd/.cache')
+
+    Pour les gros fichiers, le parsing peut être réparti sur plusieurs
+    processus. Le fichier est découpé en morceaux aux limites des lignes, puis
+    les lignes de chaque morceau sont remises dans l'ordre du fichier :
+
+    >>> csv_dict = CSVDict(jobs=4)
+
+    Avec le backend `mmap`, l'index des positions des lignes est enregistré
+    dans le dossier de cache s'il est indiqué, ce qui rend l'ouverture
+    suivante quasi immédiate.
+
+    Chaque ligne retient le fichier CSV dont elle provient dans son attribut
+    `source`. Avec plusieurs fichiers, le cache est géré fichier par fichier,
+    et chaque gros fichier est parsé sur plusieurs processus si `jobs` est
+    supérieur à 1.
+
+    Une fois le fichier lu, on peut indexer les lignes par la valeur d'un champ
+    pour les retrouver sans parcourir tout le fichier :
+
+    >>> index = csv_dict.index_by('code')
+    >>> index['1a_kaname_madoka']['name']
+
     Le fichier compagnon contient deux sections.
 
     La section `[info]` contient plusieurs paramètres pour ouvrir le fichier
     CSV :
         `file`: chemin vers le fichier CSV. Le chemin est relatif à la position
-            du fichier INI.
+            du fichier INI. Il peut s'agir d'un motif (`listing_*.csv`) ou
+            d'une liste de fichiers séparés par des virgules ou des retours à
+            la ligne. Les fichiers sont alors lus les uns après les autres
+            comme un seul fichier, avec la même section `[fields]`, et `skip`
+            s'applique au début de chacun d'eux.
         `skip`: le nombre de lignes à ignorer au début du fichier CSV. Par
             défaut, la valeur est à 0, c'est-à-dire qu'aucune ligne n'est
             ignorée.
         `delimiter`: le caractère utilisé dans le fichier CSV pour séparer les
             colonnes. Par défaut, il désigne une tabulation.
+        `backend`: la façon de lire le fichier CSV. Par défaut, `csv` lit tout
+            le fichier. Avec `mmap`, le fichier est projeté en mémoire et seule
+            la position de chaque ligne est lue à l'ouverture ; une ligne n'est
+            parsée que quand on y accède. Avec `sqlite`, `file` désigne une
+            base de données SQLite et les lignes sont lues dans une table.
+        `table`: le nom de la table à lire, obligatoire avec le backend
+            `sqlite`. Chaque champ de la section `[fields]` désigne alors une
+            colonne de la table par son nom plutôt que par son index, et
+            `skip` et `delimiter` sont ignorés.
 
     La section `[fields]` contient l'assoctiation entre les colonnes et leur
     nom. Pour chaque ligne, la valeur à gauche représente le nom de la colonne
@@ -50,34 +134,187 @@ class CSVDict:
     en commençant à 0, soit sous forme de lettres, comme dans un tableur (A, B,
     ... AA, AB).
 
+    L'index peut être suivi du type de la colonne, séparé par deux points
+    (`order = 4:int`). Les valeurs de la colonne sont alors converties une
+    seule fois à la lecture. Les types possibles sont ceux de `CONVERTERS` :
+        `str`: texte, par défaut.
+        `int`: nombre entier.
+        `float`: nombre décimal.
+        `bool`: booléen, selon la section `[booleans]` de la configuration.
+        `date`: date au format ISO 8601 (`aaaa-mm-jj`, ou `aaaa/mm/jj`),
+            convertie en objet `datetime`.
+        `time`: heure au format `hh:mm`, convertie en objet `time`.
+        `tuple`: liste de nombres décimaux séparés par des virgules.
+    Une cellule vide d'une colonne typée donne `None`. Une valeur invalide lève
+    une erreur `CSVTypeError` qui indique le fichier et la ligne.
+
+    La section optionnelle `[filter]` permet de ne garder que certaines lignes.
+    Pour chaque ligne, la valeur à gauche est le nom d'un champ de la section
+    `[fields]` et la valeur à droite une condition sur sa valeur brute :
+        `in a,b,c`: la valeur est l'une des valeurs listées.
+        `not in a,b,c`: la valeur n'est aucune des valeurs listées.
+        `= a`: la valeur est égale à `a`.
+        `!= a`: la valeur est différente de `a`.
+    La comparaison ignore la casse et les espaces autour de la valeur. Les
+    conditions sont évaluées à la lecture, avant toute conversion, et une ligne
+    doit toutes les remplir pour être gardée :
+
+        [filter]
+        come = in oui,yes
+
     Par rapport à `csv.DictReader`, l'avantage de cette classe est qu'elle ne
     dépend pas des entêtes du fichier CSV qui pourraient être renommées.  En
     revanche, elle oblige la présence du fichier INI compagnon. En outre, cette
     classe gère directement l'encodage UTF-8 pour les fichiers CSV.
 
+    Chaque ligne est un objet `CSVRow`, un tuple compact dont la classe est
+    générée une seule fois par fichier depuis la section `[fields]`. Il
+    s'utilise comme un dictionnaire en lecture : `line['code']`, `'code' in
+    line`, `line.get('code')`.
+
     Attributes:
+        logger (:obj:`logging.Logger`): logger pour toute la classe.
+        cache_directory (unicode): dossier du cache des fichiers parsés, ou
+            `None` pour ne pas utiliser de cache.
+        jobs (int): nombre de processus utilisés pour parser les fichiers de
+            plus de `PARALLEL_SIZE` octets.
         skip (int): nombre de lignes à ignorer au début du fichier CSV.
         delimiter (unicode): caractère de séparation entre les colonnes.
-        data (list of dict): contenu du fichier CSV parsé. Chaque colonne est
-            accessible par le nom de son champ. Ce champ est réinitialisé à
-            chaque appel de la méthode `read`.
+        backend (unicode): façon de lire le fichier CSV, `csv` ou `mmap`.
+        types (dict): type de chaque champ typé.
+        filters (list): conditions de la section `[filter]` sous forme de
+            tuple champ, opérateur et valeurs.
+        filtered (dict): nombre de lignes écartées par les conditions pour
+            chaque fichier CSV.
+        fields (list of unicode): noms des champs, dans l'ordre du fichier
+            compagnon.
+        bytes_read (dict): nombre d'octets lus pour chaque fichier (fichiers
+            CSV, entrées de cache et index). Permet de mesurer le coût en
+            entrées/sorties de chaque étape de la lecture.
+        data (list of :obj:`CSVRow`): contenu du fichier CSV parsé. Chaque
+            colonne est accessible par le nom de son champ. Ce champ est
+            réinitialisé à chaque appel de la méthode `read`. Avec le backend
+            `mmap`, il s'agit d'un objet :obj:`MappedRows` qui parse les lignes
+            à la demande.
+
+    Args:
+        cache_directory (unicode): dossier du cache des fichiers parsés. Par
+            défaut, aucun cache n'est utilisé.
+        jobs (int): nombre de processus utilisés pour parser les gros
+            fichiers. Par défaut, le parsing se fait dans le processus courant.
 
     """
-    def __init__(self):
+    logger = logging.getLogger('utils.csv_dict.CSVDict')
+
+    def __init__(self, cache_directory=None, jobs=1):
+        self.cache_directory = cache_directory
+        self.jobs = jobs
         self.skip = 0
         self.delimiter = r'\t'
+        self.backend = BACKEND_CSV
+        self.table = None
+        self.fields = []
+        self.types = {}
+        self.default_types = {}
+        self.filters = []
+        self.filtered = {}
         self.data = []
+        self.bytes_read = {}
 
-    def read(self, config_file):
+    def read(self, config_file, types=None):
         """Lire un fichier compagnon et par suite son fichier CSV.
 
+        Args:
+            config_file (unicode): chemin vers le fichier INI compagnon.
+            types (dict): type par défaut de certains champs, utilisé quand le
+                fichier compagnon n'en indique pas.
+
+        """
+        self.default_types = types or {}
+        csv_files, fields = self._read_config(config_file)
+
+        if self.backend in (BACKEND_MMAP, BACKEND_SQLITE):
+            load = self._map if self.backend == BACKEND_MMAP else self._query
+            parts = [load(csv_file, fields) for csv_file in csv_files]
+            self.data = parts[0] if len(parts) == 1 else ChainedRows(parts)
+            return
+
+        # les fichiers sont lus l'un après l'autre : le parsing ne gagne rien
+        # à des threads, et chaque gros fichier est de toute façon parsé sur
+        # plusieurs processus si c'est demandé
+        self.data = list(chain.from_iterable(
+            self._iter_csv(csv_file, fields) for csv_file in csv_files
+            ))
+
+    def iter_rows(self, config_file, types=None):
+        """Lire un fichier compagnon et parcourir les lignes de son fichier CSV
+        au fil de la lecture.
+
+        Le fichier compagnon est lu immédiatement, ce qui permet de signaler
+        ses erreurs au plus tôt. Les lignes du fichier CSV ne sont en revanche
+        lues et converties qu'au fur et à mesure du parcours, sans jamais être
+        toutes gardées en mémoire.
+
+        Args:
+            config_file (unicode): chemin vers le fichier INI compagnon.
+            types (dict): type par défaut de certains champs, utilisé quand le
+                fichier compagnon n'en indique pas.
+
+        Returns:
+            :obj:`iterator` of :obj:`CSVRow`: lignes du fichier CSV.
+
+        """
+        self.default_types = types or {}
+        csv_files, fields = self._read_config(config_file)
+
+        if self.backend == BACKEND_MMAP:
+            return chain.from_iterable(
+                    self._iter_map(csv_file, fields) for csv_file in csv_files
+                    )
+
+        if self.backend == BACKEND_SQLITE:
+            return chain.from_iterable(
+                    self._iter_sql(database, fields) for database in csv_files
+                    )
+
+        return chain.from_iterable(
+                self._iter_csv(csv_file, fields) for csv_file in csv_files
+                )
+
+    def signature(self, config_file):
+        """Donne la signature d'un fichier compagnon et de ses fichiers CSV.
+
+        La signature change dès que le fichier compagnon ou l'un des fichiers
+        qu'il désigne change, ce qui permet de garder en mémoire un résultat
+        calculé depuis ces fichiers. Elle ne lit pas le contenu des fichiers
+        CSV (voir la fonction `signature`).
+
+        Args:
+            config_file (unicode): chemin vers le fichier INI compagnon.
+
+        Returns:
+            tuple: signature du fichier compagnon suivie de celle de chaque
+            fichier CSV.
+
+        """
+        return tuple(
+                signature(file_name)
+                for file_name in self.files(config_file)
+                )
+
+    def files(self, config_file):
+        """Donne les fichiers lus pour un fichier compagnon.
+
         Args:
             config_file (unicode): chemin vers le fichier INI compagnon.
 
+        Returns:
+            list of unicode: chemin du fichier compagnon suivi de celui de
+            chaque fichier CSV qu'il désigne.
+
         """
-        csv_file, fields = self._read_config(config_file)
-        data = self._read_csv(csv_file)
-        self._parse(data, fields)
+        csv_files, _ = self._read_config(config_file)
+        return [config_file] + csv_files
 
     def _read_config(self, config_file):
         """Lire le fichier INI compagnon.
@@ -86,8 +323,8 @@ class CSVDict:
             config_file (unicode): chemin vers le fichier INI compagnon.
 
         Returns:
-            tuple: nom du fichier CSV à ouvrir et liste des champs sous forme de
-            tuple clé valeur.
+            tuple: liste des noms des fichiers CSV à ouvrir et liste des champs
+            sous forme de tuple clé valeur.
 
         """
         # vérifier l'existence du fichier de config
@@ -120,66 +357,98 @@ section 'fields'".encode(sys.stderr.encoding))
         if config.has_option('info', 'delimiter'):
             self.delimiter = config.get('info', 'delimiter')
 
+        if config.has_option('info', 'backend'):
+            self.backend = config.get('info', 'backend').lower()
+
+            if self.backend not in (BACKEND_CSV, BACKEND_MMAP, BACKEND_SQLITE):
+                raise ValueError("Le backend '{}' n'existe \
+pas".format(self.backend).encode(sys.stderr.encoding))
+
+        # la table est obligatoire pour une base SQLite
+        if self.backend == BACKEND_SQLITE:
+            if not config.has_option('info', 'table'):
+                raise ValueError("Le fichier compagnon doit avoir une clé \
+'table' dans la section 'info' avec le backend \
+'sqlite'".encode(sys.stderr.encoding))
+
+            self.table = config.get('info', 'table')
+
         # récupérer le nom du fichier csv
         if not config.has_option('info', 'file'):
             raise ValueError("Le fichier compagnon doit avoir une \
 clé 'file' dans la section 'info'".encode(sys.stderr.encoding))
 
         # on ajoute le chemin du dossien du fichier compagnon
-        file_name = os.path.join(
-                os.path.dirname(config_file),
-                config.get('info', 'file')
-                )
+        # La clé peut contenir plusieurs fichiers ou des motifs, qui sont
+        # développés dans l'ordre alphabétique.
+        file_names = []
+        for pattern in re.split(r'[,\n]', config.get('info', 'file')):
+            pattern = pattern.strip()
+            if not pattern:
+                continue
+
+            path = os.path.join(os.path.dirname(config_file), pattern)
+
+            # un chemin sans motif est gardé tel quel, son absence sera
+            # signalée à la lecture
+            if not any(c in pattern for c in '*?['):
+                file_names.append(path)
+                continue
+
+            matches = sorted(glob(path))
+            if not matches:
+                raise IOError("Aucun fichier CSV ne correspond au motif \
+'{}'".format(path).encode(sys.stderr.encoding))
+
+            file_names.extend(matches)
+
+        if not file_names:
+            raise ValueError("La clé 'file' de la section 'info' du fichier \
+compagnon est vide".encode(sys.stderr.encoding))
 
         # récupérer les champs
         fields = config.items('fields')
 
-        return file_name, fields
+        # récupérer les conditions sur les lignes
+        self.filters = []
+        if config.has_section('filter'):
+            names = [field for field, _ in fields]
+            for field, condition in config.items('filter'):
+                if field not in names:
+                    raise ValueError("Le champ '{}' de la section 'filter' \
+n'est pas dans la section 'fields'".format(field).encode(sys.stderr.encoding))
 
-    def _read_csv(self, csv_file):
-        """Lire le fichier CSV de données.
+                self.filters.append(parse_filter(field, condition))
 
-        Args:
-            csv_file (unicode): chemin vers le fichier CSV.
+        return file_names, fields
 
-        Returns:
-            :obj:`list`: liste des données sous forme de list pour chaque ligne.
+    def _project(self, fields):
+        """Détermine les colonnes du fichier CSV à lire.
 
-        """
-        # vérifier l'existence du fichier csv
-        if not os.path.isfile(csv_file):
-            raise IOError("Impossible de trouver le fichier \
-CSV '{}'".format(csv_file).encode(sys.stderr.encoding))
+        Seules les colonnes déclarées dans la section `[fields]` sont lues et
+        décodées, ainsi que la première colonne qui sert à ignorer les lignes
+        vides. Les autres colonnes ne sont jamais converties.
+
+        Le type de chaque champ est aussi lu, et un convertisseur est préparé
+        pour chaque champ typé.
 
-        # détecter si le fichier CSV est encodé en UTF-8 avec ou sans BOM
-        # https://stackoverflow.com/a/13591421
-        bytes_amount = min(32, os.path.getsize(csv_file))
-        raw = open(csv_file, 'rb').read(bytes_amount)
-        encoding = 'utf-8-sig' if raw.startswith(BOM_UTF8) else 'utf-8'
-
-        # lire le fichier csv
-        # on utilise le délimiteur adéquat
-        # on skippe les premières lignes avec `skip`
-        with open(csv_file, 'r', encoding=encoding) as file:
-            return list(
-                    unicode_csv_reader(
-                        file,
-                        delimiter=self.delimiter.decode('string_escape')
-                        )
-                    )[self.skip:]
-
-    def _parse(self, data, fields):
-        """Applique la liste des champs sur les données pour obtenir une liste
-        de dictionnaires.
-
-        Args:
-            data (list): liste des données sous forme de list pour chaque ligne.
+        Args:
             fields (list): liste des champs sous forme de tuple clé valeur.
 
+        Returns:
+            tuple: liste triée des index de colonnes à lire, liste des champs
+            sous forme de tuple clé position, où la position est celle de la
+            colonne dans la liste des colonnes lues, et liste des
+            convertisseurs sous forme de tuple position, champ, type et
+            fonction de conversion.
+
         """
         # préparer la liste des index sous forme de chiffres
         indexes = []
+        self.types = {}
         for field, column in fields:
+            column = self._split_type(field, column)
+
             # on essaie d'extraire directement un chiffre
             try:
                 index = int(column)
@@ -190,55 +459,1991 @@ CSV '{}'".format(csv_file).encode(sys.stderr.encoding))
 
             indexes.append((field, index))
 
-        # réinitialiser la valeur
-        self.data = []
+        # la première colonne est toujours lue
+        columns = sorted(set([0] + [index for _, index in indexes]))
+        positions = {column: position for position, column in enumerate(columns)}
+        self.fields = [field for field, _ in indexes]
+        indexes = [(field, positions[index]) for field, index in indexes]
+
+        # un convertisseur par champ typé, avec son propre cache
+        converters = [
+                (position, field, self.types[field],
+                    make_converter(self.types[field]))
+                for field, position in indexes if field in self.types
+                ]
+
+        return columns, indexes, converters
+
+    def _split_type(self, field, column):
+        """Sépare la colonne d'un champ de son type.
+
+        Le type est enregistré dans l'attribut `types` s'il n'est pas `str`.
+
+        Args:
+            field (unicode): nom du champ.
+            column (unicode): valeur du champ dans la section `[fields]`, sous
+                la forme `colonne[:type]`.
+
+        Returns:
+            unicode: colonne du champ, sans le type.
+
+        """
+        column, _, kind = column.partition(':')
+        kind = kind.strip().lower() or self.default_types.get(field, 'str')
+        if kind not in CONVERTERS:
+            raise ValueError("Le type '{kind}' du champ '{field}' \
+n'existe pas".format(kind=kind, field=field).encode(sys.stderr.encoding))
+
+        if kind != 'str':
+            self.types[field] = kind
+
+        return column.strip()
+
+    def _iter_csv(self, csv_file, fields):
+        """Parcourt les lignes d'un fichier CSV lu en entier.
+
+        Args:
+            csv_file (unicode): chemin vers le fichier CSV.
+            fields (list): liste des champs sous forme de tuple clé valeur.
+
+        Returns:
+            :obj:`iterator` of :obj:`CSVRow`: lignes du fichier CSV.
+
+        """
+        columns, indexes, converters = self._project(fields)
+
+        # les gros fichiers sont parsés en parallèle si c'est demandé
+        if self.jobs > 1 and os.path.isfile(csv_file) and \
+                os.path.getsize(csv_file) >= PARALLEL_SIZE:
+            data = self._read_csv_parallel(csv_file, columns)
+
+        else:
+            data = self._read_csv(csv_file, columns)
+
+        accept = make_predicate(self.filters, dict(indexes))
+        rows = self._parse(data, columns, indexes, converters, accept,
+                csv_file)
+
+        if self.cache_directory is None:
+            return rows
+
+        return self._cache(rows, csv_file, fields)
+
+    def _map(self, csv_file, fields):
+        """Projette un fichier CSV en mémoire.
+
+        Seules les positions de début et de fin de chaque ligne sont lues. Si
+        un dossier de cache est indiqué, ces positions y sont enregistrées et
+        réutilisées tant que la taille et la date de modification du fichier
+        n'ont pas changé. Le fichier d'index contient un petit en-tête, suivi
+        des tableaux de positions écrits tels quels, qui se relisent bien plus
+        vite qu'un pickle.
+
+        Args:
+            csv_file (unicode): chemin vers le fichier CSV.
+            fields (list): liste des champs sous forme de tuple clé valeur.
+
+        Returns:
+            :obj:`MappedRows`: lignes du fichier CSV, parsées à la demande.
+
+        """
+        # vérifier l'existence du fichier csv
+        if not os.path.isfile(csv_file):
+            raise IOError("Impossible de trouver le fichier \
+CSV '{}'".format(csv_file).encode(sys.stderr.encoding))
+
+        columns, indexes, converters = self._project(fields)
+        delimiter = self.delimiter.decode('string_escape')
+        rows = MappedRows(csv_file, columns, indexes, converters, delimiter)
+
+        # les conditions portent sur les cellules brutes du fichier
+        file_columns = {field: columns[position] for field, position in indexes}
+        accept = make_predicate(self.filters, file_columns, decode=True)
+
+        # sans cache, on parcourt le fichier pour trouver les lignes
+        if self.cache_directory is None:
+            rows.scan(self.skip, accept)
+            self._count_bytes(csv_file, len(rows._data))
+            self._count_filtered(csv_file, rows.filtered)
+            return rows
+
+        stat = os.stat(csv_file)
+        key = (
+                CACHE_VERSION,
+                os.path.abspath(csv_file),
+                stat.st_size,
+                stat.st_mtime,
+                self.skip,
+                self.delimiter,
+                tuple(self.filters),
+                # les conditions dépendent aussi de la colonne de leur champ
+                tuple(file_columns[field] for field, _, _ in self.filters),
+                )
+
+        index_file = os.path.join(
+                self.cache_directory,
+                hashlib.sha1(repr(os.path.abspath(csv_file))).hexdigest() + \
+                        INDEX_EXTENSION
+                )
+
+        # essayer de charger l'index des lignes
+        # L'en-tête donne la clé et le nombre de lignes, les tableaux ne sont
+        # lus que si la clé correspond.
+        try:
+            with open(index_file, 'rb') as file:
+                cached_key, length, filtered = pickle.load(file)
+                if cached_key == key:
+                    positions = [array(b'L') for _ in range(3)]
+                    for array_positions in positions:
+                        array_positions.fromfile(file, length)
+
+                self._count_bytes(index_file, file.tell())
+
+        except (IOError, EOFError, ValueError, TypeError,
+                pickle.UnpicklingError):
+            cached_key = None
+
+        if cached_key == key:
+            self.logger.debug("Charge l'index des lignes du fichier \
+\"{file}\" depuis le cache".format(file=csv_file))
+
+            rows.starts, rows.stops, rows.numbers = positions
+            rows.filtered = filtered
+            self._count_filtered(csv_file, filtered)
+            return rows
+
+        # parcourir le fichier et enregistrer l'index
+        rows.scan(self.skip, accept)
+        self._count_bytes(csv_file, len(rows._data))
+        self._count_filtered(csv_file, rows.filtered)
+
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+
+        with NamedTemporaryFile(dir=self.cache_directory, delete=False) as file:
+            pickle.dump(
+                    (key, len(rows.starts), rows.filtered),
+                    file,
+                    pickle.HIGHEST_PROTOCOL
+                    )
+
+            # `tofile` demande le vrai fichier, pas son enveloppe
+            for array_positions in (rows.starts, rows.stops, rows.numbers):
+                array_positions.tofile(file.file)
+
+        os.rename(file.name, index_file)
+        self.logger.debug("Enregistre l'index des lignes du fichier \
+\"{file}\" dans le cache".format(file=csv_file))
+
+        return rows
+
+    def _query(self, database, fields):
+        """Ouvre une table d'une base SQLite.
+
+        Avec le backend `sqlite`, la clé `file` désigne la base de données et
+        chaque champ de la section `[fields]` désigne une colonne de la table
+        par son nom. Seules ces colonnes sont demandées à la base, et les
+        conditions de la section `[filter]` sont ajoutées à la requête.
+
+        Args:
+            database (unicode): chemin vers la base de données.
+            fields (list): liste des champs sous forme de tuple clé valeur.
+
+        Returns:
+            :obj:`SQLiteRows`: lignes de la table, lues à la demande.
+
+        """
+        # SQLite crée une base vide si le fichier n'existe pas
+        if not os.path.isfile(database):
+            raise IOError("Impossible de trouver la base de données \
+'{}'".format(database).encode(sys.stderr.encoding))
+
+        self.types = {}
+        columns = [self._split_type(field, column) for field, column in fields]
+        self.fields = [field for field, _ in fields]
+
+        converters = [
+                (position, field, self.types[field],
+                    make_converter(self.types[field]))
+                for position, field in enumerate(self.fields)
+                if field in self.types
+                ]
+
+        rows = SQLiteRows(database, self.table, self.fields, columns,
+                converters, self.filters)
+
+        self._count_filtered(database, rows.count_filtered())
+
+        return rows
+
+    def _iter_sql(self, database, fields):
+        """Parcourt les lignes d'une table d'une base SQLite au fil de l'eau.
+
+        La connexion à la base est fermée à la fin du parcours.
+
+        Args:
+            database (unicode): chemin vers la base de données.
+            fields (list): liste des champs sous forme de tuple clé valeur.
+
+        Returns:
+            :obj:`iterator` of :obj:`CSVRow`: lignes de la table.
+
+        """
+        rows = self._query(database, fields)
+        try:
+            for row in rows:
+                yield row
+
+        finally:
+            rows.close()
+
+    def _iter_map(self, csv_file, fields):
+        """Parcourt les lignes d'un fichier CSV projeté en mémoire.
+
+        La projection et le fichier sont libérés à la fin du parcours.
+
+        Args:
+            csv_file (unicode): chemin vers le fichier CSV.
+            fields (list): liste des champs sous forme de tuple clé valeur.
+
+        Returns:
+            :obj:`iterator` of :obj:`CSVRow`: lignes du fichier CSV.
+
+        """
+        rows = self._map(csv_file, fields)
+        try:
+            for row in rows:
+                yield row
+
+        finally:
+            rows.close()
+
+    def _read_csv(self, csv_file, columns=None):
+        """Lire le fichier CSV de données.
+
+        Args:
+            csv_file (unicode): chemin vers le fichier CSV.
+            columns (list): index des colonnes à lire. Par défaut, toutes les
+                colonnes sont lues.
+
+        Returns:
+            :obj:`iterator` of list: données sous forme de liste pour chaque
+            ligne.
+
+        """
+        # ouvrir le fichier csv une seule fois, son absence est détectée à
+        # l'ouverture
+        try:
+            file = io.open(csv_file, 'rb')
+
+        except IOError:
+            raise IOError("Impossible de trouver le fichier \
+CSV '{}'".format(csv_file).encode(sys.stderr.encoding))
+
+        with file:
+            # détecter si le fichier CSV est encodé en UTF-8 avec ou sans BOM
+            # On regarde le début du tampon de lecture sans le consommer, puis
+            # on saute le BOM s'il est présent.
+            # https://stackoverflow.com/a/13591421
+            if file.peek(len(BOM_UTF8)).startswith(BOM_UTF8):
+                file.read(len(BOM_UTF8))
+
+            # lire le fichier csv
+            # Le module `csv` travaille sur les lignes encodées en UTF-8, les
+            # cellules sont décodées ensuite une par une.
+            # on utilise le délimiteur adéquat
+            # on skippe les premières lignes avec `skip` sans les garder en
+            # mémoire
+            lines = utf_8_csv_reader(
+                    file,
+                    columns=columns,
+                    delimiter=self.delimiter.decode('string_escape')
+                    )
+
+            for line in islice(lines, self.skip, None):
+                yield line
+
+            self._count_bytes(csv_file, file.tell())
+
+    def _read_csv_parallel(self, csv_file, columns):
+        """Lire le fichier CSV de données en parallèle.
+
+        Le fichier est découpé en `jobs` morceaux de tailles similaires : pour
+        chaque morceau, on se place à une position approchée puis on avance
+        jusqu'au début de la ligne suivante, sans parser le fichier. Les
+        morceaux sont lus et décodés par autant de processus. Les lignes sont
+        rendues dans l'ordre du fichier, ce qui donne le même résultat que
+        `_read_csv` tant que les guillemets des champs sont doublés, comme le
+        veut le format CSV.
+
+        Args:
+            csv_file (unicode): chemin vers le fichier CSV.
+            columns (list): index des colonnes à lire.
+
+        Returns:
+            :obj:`iterator` of list: données sous forme de liste pour chaque
+            ligne.
+
+        """
+        delimiter = self.delimiter.decode('string_escape')
+
+        # découper le fichier en morceaux de tailles similaires
+        # Seules les lignes ignorées sont parcourues par le module `csv`.
+        with open(csv_file, 'rb') as file:
+            data = mmap(file.fileno(), 0, access=ACCESS_READ)
+            try:
+                first = next(iter_records(data, delimiter, self.skip), None)
+                if first is None:
+                    return
+
+                stop = len(data)
+                boundaries = [first[0]]
+                for job in xrange(1, self.jobs):
+                    position = boundaries[0] + \
+                            (stop - boundaries[0]) * job // self.jobs
+                    start = find_record_start(
+                            data,
+                            boundaries[-1],
+                            max(position, boundaries[-1])
+                            )
+
+                    if boundaries[-1] < start < stop:
+                        boundaries.append(start)
+
+            finally:
+                data.close()
+
+        boundaries.append(stop)
+
+        chunks = [(csv_file, start, stop, delimiter, columns) for start, stop in
+                zip(boundaries[:-1], boundaries[1:])]
+
+        self.logger.debug("Parse le fichier \"{file}\" en {amount} \
+morceaux".format(file=csv_file, amount=len(chunks)))
+
+        # parser les morceaux, `map` conserve leur ordre
+        pool = Pool(min(self.jobs, len(chunks)))
+        try:
+            results = pool.map(read_chunk, chunks)
+
+        finally:
+            pool.close()
+            pool.join()
+
+        self._count_bytes(csv_file, boundaries[-1] - boundaries[0])
+
+        for lines in results:
+            for line in lines:
+                yield line
+
+    def _parse(self, data, columns, indexes, converters, accept, source):
+        """Applique la liste des champs sur les données pour obtenir des
+        lignes accessibles par nom de champ.
+
+        Les lignes qui ne remplissent pas les conditions de la section
+        `[filter]` sont écartées, puis les champs typés sont convertis.
+
+        Args:
+            data (:obj:`iterator` of list): données sous forme de liste pour
+                chaque ligne.
+            columns (list): index des colonnes lues.
+            indexes (list): liste des champs sous forme de tuple clé index.
+            converters (list): liste des convertisseurs sous forme de tuple
+                position, champ, type et fonction de conversion.
+            accept (:obj:`function`): fonction qui indique si une ligne
+                remplit les conditions, ou `None` s'il n'y en a pas.
+            source (unicode): chemin du fichier CSV d'où proviennent les
+                données.
+
+        Returns:
+            :obj:`iterator` of :obj:`CSVRow`: lignes converties.
+
+        """
+        # générer la classe des lignes une seule fois pour tout le fichier
+        # la source est ajoutée à la fin de chaque ligne
+        row_class = make_row_class([field for field, _ in indexes])
+        extract = make_extractor(
+                [index for _, index in indexes] + [len(columns)]
+                )
 
-        # remplir les données
-        # chaque ligne est convertie en dictionnaire
-        for line in data:
+        new = tuple.__new__
+        filtered = 0
+
+        # convertir les données
+        # les lignes sont numérotées depuis le début du fichier
+        for number, line in enumerate(data, self.skip + 1):
             # si la première colonne est vide, la ligne est ignorée
             if not line[0]:
                 continue
 
-            self.data.append({index[0]: line[index[1]] for index in indexes})
+            # les lignes écartées ne sont pas converties
+            if accept is not None and not accept(line):
+                filtered += 1
+                continue
 
-    def __getitem__(self, index):
-        return self.data[index]
+            convert_line(line, converters, source, number)
+            line.append(source)
+            yield new(row_class, extract(line))
 
+        self._count_filtered(source, filtered)
 
-def unicode_csv_reader(unicode_csv_data, dialect=csv.excel, **kwargs):
-    """Lit un fichier CSV en UTF-8.
+    def _cache(self, rows, csv_file, fields):
+        """Passe les lignes parsées par le cache.
 
-    Args:
-        unicode_csv_data (file): descripteur de fichier à lire.
-        dialect (classjob): type de fichier CSV (je suppose).
+        L'entrée de cache d'un fichier CSV est identifiée par son chemin et
+        les champs du fichier compagnon. Elle est valide tant que l'empreinte
+        du fichier CSV (taille, date de modification et hash du contenu) et les
+        paramètres de lecture n'ont pas changé. Sinon, les lignes sont parsées
+        puis enregistrées dans le cache. Le hash du fichier CSV n'est recalculé
+        que si sa taille ou sa date de modification a changé.
 
-    Returns:
-        :obj:`iterator`: lignes du fichier CSV décodées depuis UTF-8 vers
-        unicode.
+        Args:
+            rows (:obj:`iterator` of :obj:`CSVRow`): lignes parsées, qui ne
+                sont lues qu'en cas d'absence dans le cache.
+            csv_file (unicode): chemin vers le fichier CSV.
+            fields (list): liste des champs sous forme de tuple clé valeur.
 
-    """
-    # csv.py doesn't do Unicode; encode temporarily as UTF-8:
-    csv_reader = csv.reader(utf_8_encoder(unicode_csv_data),
-                            dialect=dialect, **kwargs)
+        Returns:
+            :obj:`iterator` of :obj:`CSVRow`: lignes du fichier CSV.
 
-    for row in csv_reader:
-        # decode UTF-8 back to Unicode, cell by cell:
-        yield [unicode(cell, 'utf-8') for cell in row]
+        """
+        # sans fichier CSV, on laisse la lecture signaler l'erreur
+        if not os.path.isfile(csv_file):
+            return rows
 
+        cache_file = os.path.join(
+                self.cache_directory,
+                hashlib.sha1(
+                    repr((os.path.abspath(csv_file), tuple(fields)))
+                    ).hexdigest() + CACHE_EXTENSION
+                )
 
-def utf_8_encoder(unicode_csv_data):
-    """Renvoit les lignes d'un descripteur de fichier en UTF-8.
+        # essayer de charger le cache
+        # Un fichier de cache illisible est considéré comme absent.
+        try:
+            with open(cache_file, 'rb') as file:
+                cached_key, values, filtered = pickle.load(file)
+                self._count_bytes(cache_file, file.tell())
+
+        except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+            cached_key, values, filtered = None, None, None
+
+        # un fichier CSV dont la taille et la date de modification n'ont pas
+        # changé n'est pas relu pour calculer son hash
+        stat = os.stat(csv_file)
+        file_print = (os.path.abspath(csv_file), stat.st_size, stat.st_mtime)
+        try:
+            reuse_print = tuple(cached_key[1][:3]) == file_print
+
+        except (TypeError, IndexError):
+            reuse_print = False
+
+        if reuse_print:
+            csv_print = cached_key[1]
+
+        else:
+            # le calcul du hash lit tout le fichier
+            csv_print = fingerprint(csv_file)
+            self._count_bytes(csv_file, csv_print[1])
+
+        key = (
+                CACHE_VERSION,
+                csv_print,
+                self.skip,
+                self.delimiter,
+                tuple(fields),
+                tuple(sorted(self.types.items())),
+                booleans_state(),
+                tuple(self.filters),
+                )
 
-    Args:
-        unicode_csv_data (file): descripteur du fichier à lire.
+        if cached_key == key:
+            self.logger.debug("Charge le fichier \"{file}\" depuis le \
+cache".format(file=csv_file))
 
-    Returns:
-        :obj:`iterator`: lignes du fichier encodées en UTF-8.
+            self._count_filtered(csv_file, filtered)
 
-    """
-    for line in unicode_csv_data:
-        yield line.encode(b'utf-8')
+            # la source n'est pas enregistrée dans le cache
+            row_class = make_row_class(self.fields)
+            source = (csv_file,)
+            new = tuple.__new__
+            return (new(row_class, value + source) for value in values)
+
+        # parser le fichier et enregistrer le résultat
+        rows = list(rows)
+
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+
+        # on écrit dans un fichier temporaire puis on le renomme, pour ne
+        # jamais laisser une entrée de cache à moitié écrite
+        with NamedTemporaryFile(dir=self.cache_directory, delete=False) as file:
+            pickle.dump(
+                    (
+                        key,
+                        [tuple(row)[:-1] for row in rows],
+                        self.filtered.get(csv_file, 0)
+                        ),
+                    file,
+                    pickle.HIGHEST_PROTOCOL
+                    )
+
+        os.rename(file.name, cache_file)
+        self.logger.debug("Enregistre le fichier \"{file}\" dans le \
+cache".format(file=csv_file))
+
+        return iter(rows)
+
+    def _count_bytes(self, file_name, amount):
+        """Comptabilise les octets lus depuis un fichier.
+
+        Args:
+            file_name (unicode): chemin vers le fichier lu.
+            amount (int): nombre d'octets lus.
+
+        """
+        self.bytes_read[file_name] = self.bytes_read.get(file_name, 0) + amount
+        self.logger.debug("Lit {amount} octets depuis \"{file}\"".format(
+            amount=amount,
+            file=file_name
+            ))
+
+    def _count_filtered(self, file_name, amount):
+        """Comptabilise les lignes écartées par les conditions d'un fichier.
+
+        Args:
+            file_name (unicode): chemin vers le fichier lu.
+            amount (int): nombre de lignes écartées.
+
+        """
+        if not self.filters:
+            return
+
+        self.filtered[file_name] = self.filtered.get(file_name, 0) + amount
+        self.logger.info("Écarte {amount} lignes de \"{file}\" selon la \
+section 'filter'".format(
+            amount=amount,
+            file=file_name
+            ))
+
+    def index_by(self, field, unique=True, last=False):
+        """Indexe les lignes lues par la valeur d'un champ.
+
+        L'index est construit en un seul parcours des données. Les valeurs
+        présentes plusieurs fois sont listées dans l'attribut `duplicates` de
+        l'index retourné.
+
+        Args:
+            field (unicode): nom du champ servant de clé.
+            unique (bool): si vrai, chaque clé donne la première ligne qui
+                porte cette valeur. Sinon, chaque clé donne la liste des lignes
+                qui portent cette valeur.
+            last (bool): si vrai et si `unique` est vrai, chaque clé donne la
+                dernière ligne qui porte cette valeur plutôt que la première.
+
+        Returns:
+            :obj:`CSVIndex`: index des lignes par valeur du champ.
+
+        """
+        if field not in self.fields:
+            raise ValueError("Le champ '{}' n'existe pas dans le fichier \
+compagnon".format(field).encode(sys.stderr.encoding))
+
+        return CSVIndex(self.data, field, unique, last)
+
+    def detect_changes(self, state_file, field='code', save=True):
+        """Compare les lignes lues avec celles de l'exécution précédente.
+
+        Chaque ligne lue est résumée par un hash de son contenu, rangé sous la
+        valeur de son champ clé. Les hashes sont comparés à ceux enregistrés
+        dans le fichier d'état, ce qui donne les clés ajoutées, supprimées et
+        modifiées. Comme la comparaison se fait par clé, réordonner les lignes
+        dans le tableur ne compte pas comme une modification. Les lignes qui
+        partagent la même clé sont hashées ensemble.
+
+        Sans fichier d'état, toutes les clés sont considérées comme ajoutées.
+
+        Args:
+            state_file (unicode): chemin vers le fichier d'état, au format
+                JSON.
+            field (unicode): nom du champ servant de clé, par défaut le code.
+            save (bool): si vrai, les hashes des lignes lues remplacent ceux
+                du fichier d'état.
+
+        Returns:
+            :obj:`Changes`: listes triées des clés ajoutées, supprimées et
+            modifiées.
+
+        """
+        if field not in self.fields:
+            raise ValueError("Le champ '{}' n'existe pas dans le fichier \
+compagnon".format(field).encode(sys.stderr.encoding))
+
+        changes = compare_hashes(hash_rows(self.data, field), state_file,
+                save)
+
+        self.logger.debug("Détecte {added} ajouts, {removed} suppressions et \
+{changed} modifications par rapport à \"{file}\"".format(
+            added=len(changes.added),
+            removed=len(changes.removed),
+            changed=len(changes.changed),
+            file=state_file
+            ))
+
+        return changes
+
+    def lookup(self, field, value):
+        """Cherche les lignes lues dont un champ a une valeur donnée.
+
+        Avec le backend `sqlite`, la recherche est faite par la base, qui peut
+        utiliser un index sur la colonne. Sinon, les lignes sont parcourues.
+
+        Args:
+            field (unicode): nom du champ.
+            value: valeur cherchée.
+
+        Returns:
+            list of :obj:`CSVRow`: lignes correspondantes, dans l'ordre.
+
+        """
+        if field not in self.fields:
+            raise ValueError("Le champ '{}' n'existe pas dans le fichier \
+compagnon".format(field).encode(sys.stderr.encoding))
+
+        if hasattr(self.data, 'lookup'):
+            return self.data.lookup(field, value)
+
+        return [row for row in self.data if row[field] == value]
+
+    def close(self):
+        """Libère le fichier projeté en mémoire avec le backend `mmap`, ou la
+        connexion à la base avec le backend `sqlite`.
+
+        """
+        if isinstance(self.data, (MappedRows, ChainedRows, SQLiteRows)):
+            self.data.close()
+
+    def __getitem__(self, index):
+        return self.data[index]
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+class CSVRow(tuple):
+    """Ligne d'un fichier CSV accessible par nom de champ.
+
+    Il s'agit d'un tuple qui contient les valeurs des champs dans l'ordre du
+    fichier compagnon. L'association entre le nom d'un champ et sa position
+    est portée par la classe, et non par chaque ligne, ce qui rend l'objet
+    bien plus compact qu'un dictionnaire. Cette classe n'est pas utilisée
+    directement, mais dérivée pour chaque fichier par `make_row_class`.
+
+    L'accès par un nom de champ se comporte comme pour un dictionnaire, l'accès
+    par un entier comme pour un tuple. Le dernier élément du tuple est le
+    chemin du fichier CSV d'où provient la ligne, accessible par l'attribut
+    `source`.
+
+    Attributes:
+        _fields (tuple of unicode): noms des champs.
+        _positions (dict): position de chaque champ dans le tuple.
+
+    """
+    __slots__ = ()
+    _fields = ()
+    _positions = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, long, slice)):
+            return tuple.__getitem__(self, key)
+
+        return tuple.__getitem__(self, self._positions[key])
+
+    def __contains__(self, key):
+        return key in self._positions
+
+    def __repr__(self):
+        return '{}({})'.format(
+                self.__class__.__name__,
+                ', '.join('{}={!r}'.format(field, value) for field, value in
+                    self.items())
+                )
+
+    @property
+    def source(self):
+        """unicode: chemin du fichier CSV d'où provient la ligne.
+
+        """
+        return tuple.__getitem__(self, -1)
+
+    def get(self, key, default=None):
+        """Retourne la valeur d'un champ, ou une valeur par défaut si le champ
+        n'existe pas.
+
+        Args:
+            key (unicode): nom du champ.
+            default: valeur retournée si le champ n'existe pas.
+
+        """
+        if key not in self._positions:
+            return default
+
+        return self[key]
+
+    def keys(self):
+        """Retourne les noms des champs.
+
+        """
+        return list(self._fields)
+
+    def values(self):
+        """Retourne les valeurs des champs.
+
+        """
+        return list(tuple.__iter__(self))[:len(self._fields)]
+
+    def items(self):
+        """Retourne les champs sous forme de tuple clé valeur.
+
+        """
+        return zip(self._fields, tuple.__iter__(self))
+
+
+class CSVIndex(Mapping):
+    """Index des lignes d'un fichier CSV par la valeur d'un champ.
+
+    L'index garde, pour chaque clé, la position des lignes correspondantes et
+    les retrouve dans les données à la demande. Les clés sont parcourues dans
+    l'ordre de leur première apparition dans le fichier.
+
+    Attributes:
+        rows (list of :obj:`CSVRow`): lignes indexées.
+        field (unicode): nom du champ servant de clé.
+        unique (bool): si vrai, chaque clé donne une seule ligne, sinon une
+            liste de lignes.
+        last (bool): si vrai, la ligne donnée pour une clé unique est la
+            dernière qui porte cette valeur, sinon la première.
+        positions (:obj:`collections.OrderedDict`): positions des lignes pour
+            chaque clé.
+        duplicates (:obj:`collections.OrderedDict`): positions des lignes pour
+            chaque clé présente plusieurs fois.
+
+    Args:
+        rows (list of :obj:`CSVRow`): lignes à indexer.
+        field (unicode): nom du champ servant de clé.
+        unique (bool): si vrai, chaque clé donne la première ligne qui porte
+            cette valeur, sinon la liste des lignes.
+        last (bool): si vrai, chaque clé unique donne la dernière ligne qui
+            porte cette valeur plutôt que la première.
+
+    """
+    def __init__(self, rows, field, unique=True, last=False):
+        self.rows = rows
+        self.field = field
+        self.unique = unique
+        self.last = last
+
+        # si les lignes savent extraire une seule colonne, on évite de parser
+        # les lignes en entier
+        if hasattr(rows, 'column'):
+            keys = rows.column(field)
+
+        else:
+            keys = (row[field] for row in rows)
+
+        self.positions = OrderedDict()
+        for position, key in enumerate(keys):
+            self.positions.setdefault(key, []).append(position)
+
+        self.duplicates = OrderedDict(
+                (key, positions) for key, positions in
+                self.positions.iteritems() if len(positions) > 1
+                )
+
+    def __getitem__(self, key):
+        positions = self.positions[key]
+        if self.unique:
+            return self.rows[positions[-1 if self.last else 0]]
+
+        return [self.rows[position] for position in positions]
+
+    def __iter__(self):
+        return iter(self.positions)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def close(self):
+        """Libère les lignes indexées si elles gardent un fichier ou une
+        connexion ouverts.
+
+        """
+        if isinstance(self.rows, (MappedRows, ChainedRows, SQLiteRows)):
+            self.rows.close()
+
+
+class MappedRows(object):
+    """Lignes d'un fichier CSV projeté en mémoire, parsées à la demande.
+
+    Le fichier est projeté en mémoire avec `mmap`. Pour chaque ligne, seules
+    ses positions de début et de fin dans le fichier sont connues. Une ligne
+    n'est parsée et décodée que quand on y accède. Les lignes peuvent contenir
+    des champs entre guillemets qui contiennent des retours à la ligne.
+
+    Attributes:
+        csv_file (unicode): chemin vers le fichier CSV.
+        columns (list of int): index des colonnes à lire.
+        converters (list): liste des convertisseurs sous forme de tuple
+            position, champ, type et fonction de conversion.
+        delimiter (str): caractère de séparation entre les colonnes.
+        starts (:obj:`array.array`): position de début de chaque ligne.
+        stops (:obj:`array.array`): position de fin de chaque ligne.
+        numbers (:obj:`array.array`): numéro de chaque ligne dans le fichier.
+        filtered (int): nombre de lignes écartées par les conditions.
+
+    Args:
+        csv_file (unicode): chemin vers le fichier CSV.
+        columns (list of int): index des colonnes à lire.
+        indexes (list): liste des champs sous forme de tuple clé position.
+        converters (list): liste des convertisseurs sous forme de tuple
+            position, champ, type et fonction de conversion.
+        delimiter (str): caractère de séparation entre les colonnes.
+
+    """
+    def __init__(self, csv_file, columns, indexes, converters, delimiter):
+        self.csv_file = csv_file
+        self.columns = columns
+        self.converters = converters
+        self.delimiter = delimiter
+        self.starts = array(b'L')
+        self.stops = array(b'L')
+        self.numbers = array(b'L')
+        self.filtered = 0
+
+        self._positions = dict(indexes)
+        self._row_class = make_row_class([field for field, _ in indexes])
+        self._extract = make_extractor(
+                [position for _, position in indexes] + [len(columns)]
+                )
+
+        # un fichier vide ne peut pas être projeté
+        self._file = open(csv_file, 'rb')
+        if os.fstat(self._file.fileno()).st_size:
+            self._data = mmap(self._file.fileno(), 0, access=ACCESS_READ)
+
+        else:
+            self._data = b''
+
+    def scan(self, skip=0, accept=None):
+        """Parcourt le fichier pour trouver les positions des lignes.
+
+        Le parcours utilise le module `csv` pour délimiter les lignes, sans
+        décoder les cellules. Les `skip` premières lignes et les lignes dont la
+        première colonne est vide sont ignorées, ainsi que celles qui ne
+        remplissent pas les conditions.
+
+        Args:
+            skip (int): nombre de lignes à ignorer au début du fichier.
+            accept (:obj:`function`): fonction qui indique si une ligne brute
+                remplit les conditions, ou `None` s'il n'y en a pas.
+
+        """
+        self.starts = array(b'L')
+        self.stops = array(b'L')
+        self.numbers = array(b'L')
+        self.filtered = 0
+
+        records = iter_records(self._data, self.delimiter, skip)
+        for number, (start, stop, row) in enumerate(records, skip + 1):
+            # si la première colonne est vide, la ligne est ignorée
+            if not row or not row[0]:
+                continue
+
+            if accept is not None and not accept(row):
+                self.filtered += 1
+                continue
+
+            self.starts.append(start)
+            self.stops.append(stop)
+            self.numbers.append(number)
+
+    def _read(self, position, columns):
+        """Parse une ligne.
+
+        Args:
+            position (int): position de la ligne.
+            columns (list of int): index des colonnes à décoder.
+
+        Returns:
+            list: cellules décodées.
+
+        """
+        record = self._data[self.starts[position]:self.stops[position]]
+        return next(utf_8_csv_reader(
+            record.splitlines(True),
+            columns=columns,
+            delimiter=self.delimiter
+            ))
+
+    def column(self, field):
+        """Parcourt les valeurs d'un seul champ pour toutes les lignes.
+
+        Seule la colonne de ce champ est décodée.
+
+        Args:
+            field (unicode): nom du champ.
+
+        Returns:
+            :obj:`iterator` of unicode: valeur du champ pour chaque ligne.
+
+        """
+        position = self._positions[field]
+        columns = [self.columns[position]]
+        converters = [(0, name, kind, convert) for index, name, kind, convert
+                in self.converters if index == position]
+
+        for row in xrange(len(self)):
+            line = self._read(row, columns)
+            convert_line(line, converters, self.csv_file, self.numbers[row])
+            yield line[0]
+
+    def close(self):
+        """Libère la projection en mémoire et le fichier.
+
+        """
+        if isinstance(self._data, mmap):
+            self._data.close()
+
+        self._file.close()
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in xrange(*position.indices(len(self)))]
+
+        if position < 0:
+            position += len(self)
+
+        if not 0 <= position < len(self):
+            raise IndexError("L'index de ligne demandé n'existe \
+pas".encode(sys.stderr.encoding))
+
+        line = self._read(position, self.columns)
+        convert_line(line, self.converters, self.csv_file,
+                self.numbers[position])
+
+        line.append(self.csv_file)
+        return tuple.__new__(self._row_class, self._extract(line))
+
+    def __iter__(self):
+        for position in xrange(len(self)):
+            yield self[position]
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class ChainedRows(object):
+    """Enchaînement de plusieurs séquences de lignes en une seule.
+
+    Sert à présenter les lignes de plusieurs fichiers projetés en mémoire
+    comme une seule séquence.
+
+    Attributes:
+        parts (list of :obj:`MappedRows`): séquences enchaînées.
+
+    Args:
+        parts (list of :obj:`MappedRows`): séquences à enchaîner.
+
+    """
+    def __init__(self, parts):
+        self.parts = parts
+
+        # position de la première ligne de chaque séquence
+        self._offsets = [0]
+        for part in parts:
+            self._offsets.append(self._offsets[-1] + len(part))
+
+    def column(self, field):
+        """Parcourt les valeurs d'un seul champ pour toutes les lignes.
+
+        Args:
+            field (unicode): nom du champ.
+
+        Returns:
+            :obj:`iterator` of unicode: valeur du champ pour chaque ligne.
+
+        """
+        return chain.from_iterable(part.column(field) for part in self.parts)
+
+    def lookup(self, field, value):
+        """Cherche les lignes dont un champ a une valeur donnée.
+
+        Args:
+            field (unicode): nom du champ.
+            value: valeur cherchée.
+
+        Returns:
+            list of :obj:`CSVRow`: lignes correspondantes, dans l'ordre.
+
+        """
+        return [row for part in self.parts
+                for row in part.lookup(field, value)]
+
+    def close(self):
+        """Libère toutes les séquences.
+
+        """
+        for part in self.parts:
+            part.close()
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in xrange(*position.indices(len(self)))]
+
+        if position < 0:
+            position += len(self)
+
+        if not 0 <= position < len(self):
+            raise IndexError("L'index de ligne demandé n'existe \
+pas".encode(sys.stderr.encoding))
+
+        part = bisect_right(self._offsets, position) - 1
+        return self.parts[part][position - self._offsets[part]]
+
+    def __iter__(self):
+        return chain.from_iterable(self.parts)
+
+    def __len__(self):
+        return self._offsets[-1]
+
+
+class SQLiteRows(object):
+    """Lignes d'une table d'une base SQLite, lues à la demande.
+
+    Seules les colonnes des champs sont demandées à la base. Les conditions de
+    la section `[filter]` sont traduites en clause `WHERE`, et la recherche
+    d'une valeur passe par une requête, qui profite des index de la table.
+    Les lignes sont rangées dans l'ordre de leur `rowid` ; la liste des
+    `rowid` n'est chargée qu'au premier accès par position.
+
+    Les valeurs `NULL` donnent une chaîne vide, comme une cellule vide d'un
+    fichier CSV, et les nombres des champs non typés sont convertis en texte.
+    Comme les lignes dont la première colonne est vide dans un fichier CSV,
+    les lignes dont le premier champ est vide sont ignorées.
+
+    Attributes:
+        database (unicode): chemin vers la base de données.
+        table (unicode): nom de la table.
+        fields (list of unicode): noms des champs.
+        columns (list of unicode): noms des colonnes de la table.
+        converters (list): liste des convertisseurs sous forme de tuple
+            position, champ, type et fonction de conversion.
+
+    Args:
+        database (unicode): chemin vers la base de données.
+        table (unicode): nom de la table.
+        fields (list of unicode): noms des champs.
+        columns (list of unicode): nom de la colonne de chaque champ.
+        converters (list): liste des convertisseurs sous forme de tuple
+            position, champ, type et fonction de conversion.
+        filters (list): conditions sous forme de tuple champ, opérateur et
+            valeurs.
+
+    """
+    def __init__(self, database, table, fields, columns, converters,
+            filters=None):
+        self.database = database
+        self.table = table
+        self.fields = fields
+        self.columns = columns
+        self.converters = converters
+
+        self._connection = sqlite3.connect(database)
+        self._rowids = None
+        self._row_class = make_row_class(fields)
+        self._positions = {field: i for i, field in enumerate(fields)}
+
+        # les nombres ne sont gardés tels quels que pour les champs dont le
+        # type les accepte
+        numeric = set(
+                position for position, _, kind, _ in converters
+                if kind in ('int', 'float', 'bool')
+                )
+
+        self._text = [i not in numeric for i in xrange(len(fields))]
+
+        self._check()
+
+        # préparer les morceaux des requêtes
+        self._from = 'FROM {}'.format(quote_identifier(table))
+        self._select = 'SELECT rowid, {}'.format(
+                ', '.join(quote_identifier(column) for column in columns)
+                )
+
+        self._base = "coalesce({}, '') != ''".format(
+                quote_identifier(columns[0])
+                )
+
+        self._where, self._parameters = make_where(
+                filters or [],
+                dict(zip(fields, columns))
+                )
+
+    def _check(self):
+        """Vérifie l'existence de la table et de ses colonnes.
+
+        """
+        table_info = self._connection.execute(
+                'PRAGMA table_info({})'.format(quote_identifier(self.table))
+                ).fetchall()
+
+        if not table_info:
+            raise ValueError("La table '{table}' n'existe pas dans la base \
+'{database}'".format(
+                table=self.table,
+                database=self.database
+                ).encode(sys.stderr.encoding))
+
+        existing = set(info[1].lower() for info in table_info)
+        for field, column in zip(self.fields, self.columns):
+            if column.lower() not in existing:
+                raise ValueError("La colonne '{column}' du champ '{field}' \
+n'existe pas dans la table '{table}'".format(
+                    column=column,
+                    field=field,
+                    table=self.table
+                    ).encode(sys.stderr.encoding))
+
+    def _execute(self, query, parameters=(), where=None):
+        """Exécute une requête avec les conditions de la table.
+
+        Args:
+            query (unicode): début de la requête, avant la clause `WHERE`.
+            parameters (tuple): paramètres des conditions supplémentaires.
+            where (unicode): condition supplémentaire.
+
+        Returns:
+            :obj:`sqlite3.Cursor`: curseur sur le résultat.
+
+        """
+        clauses = [clause for clause in (self._base, self._where, where)
+                if clause]
+
+        query += ' WHERE ' + ' AND '.join(clauses)
+
+        return self._connection.execute(
+                query + ' ORDER BY rowid',
+                tuple(self._parameters) + tuple(parameters)
+                )
+
+    def _make_row(self, record):
+        """Crée une ligne depuis un enregistrement de la base.
+
+        Args:
+            record (tuple): `rowid` suivi des valeurs des colonnes.
+
+        Returns:
+            :obj:`CSVRow`: ligne convertie.
+
+        """
+        line = [self._normalize(i, value) for i, value in
+                enumerate(record[1:])]
+
+        convert_line(line, self.converters, self.database, record[0])
+        line.append(self.database)
+
+        return tuple.__new__(self._row_class, line)
+
+    def _normalize(self, position, value):
+        """Ramène une valeur de la base à ce que donnerait un fichier CSV.
+
+        Args:
+            position (int): position du champ.
+            value: valeur de la base.
+
+        Returns:
+            valeur normalisée.
+
+        """
+        if value is None:
+            return ''
+
+        if self._text[position] and not isinstance(value, unicode):
+            return unicode(value)
+
+        return value
+
+    def count_filtered(self):
+        """Compte les lignes de la table écartées par les conditions.
+
+        Returns:
+            int: nombre de lignes écartées.
+
+        """
+        if not self._where:
+            return 0
+
+        total = self._connection.execute(
+                'SELECT count(*) {table} WHERE {base}'.format(
+                    table=self._from,
+                    base=self._base
+                    )
+                ).fetchone()[0]
+
+        return total - len(self)
+
+    def column(self, field):
+        """Parcourt les valeurs d'un seul champ pour toutes les lignes.
+
+        Seule la colonne de ce champ est demandée à la base.
+
+        Args:
+            field (unicode): nom du champ.
+
+        Returns:
+            :obj:`iterator`: valeur du champ pour chaque ligne.
+
+        """
+        position = self._positions[field]
+        converters = [(0, name, kind, convert) for index, name, kind, convert
+                in self.converters if index == position]
+
+        cursor = self._execute('SELECT rowid, {column} {table}'.format(
+            column=quote_identifier(self.columns[position]),
+            table=self._from
+            ))
+
+        for rowid, value in cursor:
+            line = [self._normalize(position, value)]
+            convert_line(line, converters, self.database, rowid)
+            yield line[0]
+
+    def lookup(self, field, value):
+        """Cherche les lignes dont un champ a une valeur donnée.
+
+        Args:
+            field (unicode): nom du champ.
+            value: valeur cherchée.
+
+        Returns:
+            list of :obj:`CSVRow`: lignes correspondantes, dans l'ordre.
+
+        """
+        column = self.columns[self._positions[field]]
+        cursor = self._execute(
+                self._select + ' ' + self._from,
+                (value,),
+                '{} = ?'.format(quote_identifier(column))
+                )
+
+        return [self._make_row(record) for record in cursor]
+
+    def close(self):
+        """Ferme la connexion à la base.
+
+        """
+        self._connection.close()
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self[i] for i in xrange(*position.indices(len(self)))]
+
+        if position < 0:
+            position += len(self)
+
+        if not 0 <= position < len(self):
+            raise IndexError("L'index de ligne demandé n'existe \
+pas".encode(sys.stderr.encoding))
+
+        record = self._connection.execute(
+                '{select} {table} WHERE rowid = ?'.format(
+                    select=self._select,
+                    table=self._from
+                    ),
+                (self._rowids[position],)
+                ).fetchone()
+
+        return self._make_row(record)
+
+    def __iter__(self):
+        for record in self._execute(self._select + ' ' + self._from):
+            yield self._make_row(record)
+
+    def __len__(self):
+        if self._rowids is None:
+            self._rowids = array(b'l', (
+                rowid for rowid, in self._execute('SELECT rowid ' + self._from)
+                ))
+
+        return len(self._rowids)
+
+
+class CSVTypeError(ValueError):
+    """Erreur de conversion d'une valeur d'un champ typé.
+
+    Attributes:
+        source (unicode): chemin du fichier CSV.
+        row (int): numéro de la ligne dans le fichier, en commençant à 1.
+        field (unicode): nom du champ.
+        kind (unicode): type attendu.
+        value (unicode): valeur invalide.
+
+    Args:
+        source (unicode): chemin du fichier CSV.
+        row (int): numéro de la ligne dans le fichier.
+        field (unicode): nom du champ.
+        kind (unicode): type attendu.
+        value (unicode): valeur invalide.
+
+    """
+    def __init__(self, source, row, field, kind, value):
+        self.source = source
+        self.row = row
+        self.field = field
+        self.kind = kind
+        self.value = value
+
+        super(CSVTypeError, self).__init__("La valeur \"{value}\" du champ \
+\"{field}\" à la ligne {row} du fichier \"{source}\" n'est pas du type \
+{kind}".format(
+            value=value,
+            field=field,
+            row=row,
+            source=source,
+            kind=kind
+            ).encode(sys.stderr.encoding))
+
+
+def to_bool(value):
+    """Convertit une valeur en booléen selon la section `[booleans]` de la
+    configuration.
+
+    Args:
+        value (unicode): valeur à convertir.
+
+    Returns:
+        bool: valeur convertie.
+
+    """
+    # les bases de données stockent les booléens sous forme de nombres
+    if not isinstance(value, basestring):
+        return bool(value)
+
+    try:
+        return config.getboolean('booleans', value.strip().lower())
+
+    except (NoOptionError, NoSectionError):
+        raise ValueError(value)
+
+
+def to_date(value):
+    """Convertit une date au format ISO 8601 en objet `datetime`.
+
+    On accepte aussi les `/` à la place des `-`, parce que LibreOffice Calc les
+    utilise parfois à l'export.
+
+    Args:
+        value (unicode): date à convertir.
+
+    Returns:
+        :obj:`datetime`: date convertie.
+
+    """
+    return datetime.strptime(value.replace('/', '-'), DATE_FORMAT)
+
+
+def to_time(value):
+    """Convertit une heure au format `hh:mm` en objet `time`.
+
+    Args:
+        value (unicode): heure à convertir.
+
+    Returns:
+        :obj:`datetime.time`: heure convertie.
+
+    """
+    return datetime.strptime(value, TIME_FORMAT).time()
+
+
+def to_tuple(value):
+    """Convertit une liste de nombres séparés par des virgules en tuple.
+
+    Args:
+        value (unicode): liste à convertir.
+
+    Returns:
+        tuple of float: liste convertie.
+
+    """
+    return tuple(float(v) for v in value.split(','))
+
+
+CONVERTERS = {
+        'str': None,
+        'int': int,
+        'float': float,
+        'bool': to_bool,
+        'date': to_date,
+        'time': to_time,
+        'tuple': to_tuple,
+        }
+
+
+def make_converter(kind):
+    """Prépare la fonction de conversion d'un type.
+
+    La fonction garde en cache les dernières conversions, ce qui évite de
+    reconvertir les valeurs qui se répètent dans une colonne (jours, heures,
+    booléens...). Une valeur vide donne `None`.
+
+    Args:
+        kind (unicode): nom du type, clé de `CONVERTERS`.
+
+    Returns:
+        :obj:`function`: fonction de conversion.
+
+    """
+    function = CONVERTERS[kind]
+    cache = {}
+
+    def convert(value):
+        try:
+            return cache[value]
+
+        except KeyError:
+            pass
+
+        result = None if value in ('', None) else function(value)
+        if len(cache) < CONVERTER_CACHE_SIZE:
+            cache[value] = result
+
+        return result
+
+    return convert
+
+
+def convert_line(line, converters, source, number):
+    """Convertit les champs typés d'une ligne, sur place.
+
+    Args:
+        line (list): cellules de la ligne.
+        converters (list): liste des convertisseurs sous forme de tuple
+            position, champ, type et fonction de conversion.
+        source (unicode): chemin du fichier CSV, pour les erreurs.
+        number (int): numéro de la ligne, pour les erreurs.
+
+    """
+    for position, field, kind, convert in converters:
+        try:
+            line[position] = convert(line[position])
+
+        except (ValueError, TypeError):
+            raise CSVTypeError(source, number, field, kind, line[position])
+
+
+def parse_filter(field, condition):
+    """Lit une condition de la section `[filter]`.
+
+    Args:
+        field (unicode): nom du champ.
+        condition (unicode): condition, sous la forme `opérateur valeurs`.
+
+    Returns:
+        tuple: champ, opérateur et tuple des valeurs en minuscules.
+
+    """
+    condition = condition.strip()
+    for operator in FILTER_OPERATORS:
+        if not condition.lower().startswith(operator):
+            continue
+
+        values = condition[len(operator):]
+
+        # les opérateurs en lettres doivent être suivis d'un espace
+        if operator[-1].isalpha() and values[:1] not in ('', ' ', '\t'):
+            continue
+
+        if operator.endswith('in'):
+            values = values.split(',')
+
+        else:
+            values = [values]
+
+        return (
+                field,
+                operator,
+                tuple(v.strip().lower() for v in values)
+                )
+
+    raise ValueError("La condition '{condition}' du champ '{field}' n'est pas \
+valide, les opérateurs possibles sont : {operators}".format(
+        condition=condition,
+        field=field,
+        operators=', '.join(FILTER_OPERATORS)
+        ).encode(sys.stderr.encoding))
+
+
+def make_predicate(filters, positions, decode=False):
+    """Prépare la fonction qui indique si une ligne remplit les conditions.
+
+    Args:
+        filters (list): conditions sous forme de tuple champ, opérateur et
+            valeurs.
+        positions (dict): position de chaque champ dans la ligne.
+        decode (bool): si vrai, les cellules de la ligne sont en UTF-8 et
+            doivent être décodées avant la comparaison.
+
+    Returns:
+        :obj:`function`: fonction qui prend une ligne et renvoie `True` si elle
+        remplit toutes les conditions, ou `None` s'il n'y a pas de condition.
+
+    """
+    if not filters:
+        return None
+
+    tests = []
+    for field, operator, values in filters:
+        expected = operator in ('in', '=')
+        tests.append((positions[field], frozenset(values), expected))
+
+    def accept(line):
+        for position, values, expected in tests:
+            value = line[position] if position < len(line) else ''
+            if decode:
+                value = value.decode('utf-8')
+
+            if (value.strip().lower() in values) is not expected:
+                return False
+
+        return True
+
+    return accept
+
+
+def hash_rows(rows, field):
+    """Calcule le hash du contenu des lignes pour chaque valeur d'un champ.
+
+    Args:
+        rows (:obj:`iterator` of :obj:`CSVRow`): lignes à hasher.
+        field (unicode): nom du champ servant de clé.
+
+    Returns:
+        dict: hash hexadécimal des lignes pour chaque clé, convertie en texte.
+
+    """
+    hashes = {}
+    for _ in iter_hashed_rows(rows, field, hashes):
+        pass
+
+    return hashes
+
+
+def iter_hashed_rows(rows, field, hashes):
+    """Parcourt des lignes en calculant au passage le hash de leur contenu.
+
+    Les lignes qui partagent la même valeur du champ sont hashées ensemble.
+    Les noms des champs entrent dans le hash, ainsi un changement de la section
+    `[fields]` modifie toutes les lignes. La source des lignes n'y entre pas.
+
+    Args:
+        rows (:obj:`iterator` of :obj:`CSVRow`): lignes à parcourir.
+        field (unicode): nom du champ servant de clé.
+        hashes (dict): dictionnaire complété, une fois toutes les lignes
+            parcourues, par le hash hexadécimal des lignes pour chaque clé,
+            convertie en texte.
+
+    Returns:
+        :obj:`iterator` of :obj:`CSVRow`: lignes parcourues.
+
+    """
+    header = None
+    states = {}
+    for row in rows:
+        if header is None:
+            header = repr(tuple(row.keys()))
+
+        key = unicode(row[field])
+        if key not in states:
+            states[key] = hashlib.sha1(header)
+
+        states[key].update(repr(tuple(row.values())))
+
+        yield row
+
+    hashes.update(
+            (key, state.hexdigest()) for key, state in states.iteritems()
+            )
+
+
+def compare_hashes(current, state_file, save=True):
+    """Compare le hash des lignes avec celui de l'exécution précédente.
+
+    Sans fichier d'état, toutes les clés sont considérées comme ajoutées. Un
+    fichier d'état illisible est considéré comme absent.
+
+    Args:
+        current (dict): hash des lignes pour chaque clé, voir `hash_rows`.
+        state_file (unicode): chemin vers le fichier d'état, au format JSON.
+        save (bool): si vrai, les hashes donnés remplacent ceux du fichier
+            d'état.
+
+    Returns:
+        :obj:`Changes`: listes triées des clés ajoutées, supprimées et
+        modifiées.
+
+    """
+    # charger l'état précédent
+    try:
+        with open(state_file, 'r', encoding='utf8') as file:
+            previous = json.load(file)
+
+    except (IOError, ValueError):
+        previous = {}
+
+    changes = Changes(
+            added=sorted(set(current) - set(previous)),
+            removed=sorted(set(previous) - set(current)),
+            changed=sorted(
+                key for key, value in current.iteritems()
+                if key in previous and previous[key] != value
+                ),
+            )
+
+    if not save:
+        return changes
+
+    # on écrit dans un fichier temporaire puis on le renomme, pour ne jamais
+    # laisser un fichier d'état à moitié écrit
+    directory = os.path.dirname(os.path.abspath(state_file))
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    with NamedTemporaryFile(dir=directory, delete=False) as file:
+        json.dump(current, file, sort_keys=True, indent=0)
+
+    os.rename(file.name, state_file)
+
+    return changes
+
+
+def quote_identifier(name):
+    """Protège un nom de table ou de colonne pour une requête SQL.
+
+    Args:
+        name (unicode): nom à protéger.
+
+    Returns:
+        unicode: nom entre guillemets.
+
+    """
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def make_where(filters, columns):
+    """Traduit les conditions de la section `[filter]` en clause SQL.
+
+    Comme pour un fichier CSV, la comparaison ignore la casse et les espaces
+    autour de la valeur, et une valeur `NULL` est vue comme vide.
+
+    Args:
+        filters (list): conditions sous forme de tuple champ, opérateur et
+            valeurs.
+        columns (dict): nom de la colonne de chaque champ.
+
+    Returns:
+        tuple: condition SQL, ou chaîne vide s'il n'y a pas de condition, et
+        liste de ses paramètres.
+
+    """
+    clauses = []
+    parameters = []
+    for field, operator, values in filters:
+        value = "lower(trim(coalesce({}, '')))".format(
+                quote_identifier(columns[field])
+                )
+
+        if operator in ('in', 'not in'):
+            clauses.append('{value} {operator} ({marks})'.format(
+                value=value,
+                operator=operator.upper(),
+                marks=', '.join(['?'] * len(values))
+                ))
+
+        else:
+            clauses.append('{value} {operator} ?'.format(
+                value=value,
+                operator=operator
+                ))
+
+        parameters.extend(values)
+
+    return ' AND '.join(clauses), parameters
+
+
+def booleans_state():
+    """Donne le contenu de la section `[booleans]` de la configuration.
+
+    Sert à invalider le cache quand la conversion des booléens change.
+
+    Returns:
+        tuple: options de la section sous forme de tuple clé valeur.
+
+    """
+    if not config.has_section('booleans'):
+        return ()
+
+    return tuple(sorted(config.items('booleans')))
+
+
+def iter_records(data, delimiter, skip=0):
+    """Parcourt les lignes d'un fichier CSV en UTF-8 avec leur position.
+
+    Les lignes sont délimitées par le module `csv`, ce qui gère correctement
+    les champs entre guillemets qui contiennent des retours à la ligne. Les
+    cellules ne sont pas décodées. Le BOM éventuel est ignoré.
+
+    Args:
+        data (:obj:`mmap.mmap` or str): contenu du fichier.
+        delimiter (str): caractère de séparation entre les colonnes.
+        skip (int): nombre de lignes à ignorer au début du fichier.
+
+    Returns:
+        :obj:`iterator` of tuple: position de début, position de fin et
+        cellules encodées de chaque ligne.
+
+    """
+    if not data:
+        return
+
+    # ignorer le BOM
+    start = len(BOM_UTF8) if data[:len(BOM_UTF8)] == BOM_UTF8 else 0
+    data.seek(start)
+
+    # le module `csv` ne lit pas plus de lignes que nécessaire pour compléter
+    # un enregistrement, la position courante est donc sa fin
+    reader = csv.reader(iter(data.readline, b''), delimiter=delimiter)
+    for number, row in enumerate(reader):
+        stop = data.tell()
+        if number >= skip:
+            yield start, stop, row
+
+        start = stop
+
+
+def find_record_start(data, start, position):
+    """Trouve le début de la première ligne d'un fichier CSV après une position.
+
+    Un retour à la ligne ne termine une ligne que s'il est en dehors d'un champ
+    entre guillemets, c'est-à-dire s'il est précédé d'un nombre pair de
+    guillemets depuis un début de ligne connu. Les guillemets d'un champ sont
+    en effet doublés.
+
+    Args:
+        data (:obj:`mmap.mmap` or str): contenu du fichier.
+        start (int): position d'un début de ligne connu.
+        position (int): position à partir de laquelle chercher, après
+            `start`.
+
+    Returns:
+        int: position du début de la ligne, ou taille des données s'il n'y a
+        plus de ligne.
+
+    """
+    quotes = data[start:position].count(b'"')
+    while True:
+        newline = data.find(b'\n', position)
+        if newline < 0:
+            return len(data)
+
+        quotes += data[position:newline].count(b'"')
+        position = newline + 1
+        if quotes % 2 == 0:
+            return position
+
+
+def read_chunk(chunk):
+    """Lit et décode un morceau d'un fichier CSV en UTF-8.
+
+    Cette fonction est appelée dans un processus séparé par
+    `CSVDict._read_csv_parallel`.
+
+    Args:
+        chunk (tuple): chemin vers le fichier CSV, positions de début et de fin
+            du morceau, caractère de séparation entre les colonnes et index des
+            colonnes à lire.
+
+    Returns:
+        list of list: données sous forme de liste pour chaque ligne.
+
+    """
+    csv_file, start, stop, delimiter, columns = chunk
+    with open(csv_file, 'rb') as file:
+        file.seek(start)
+        data = file.read(stop - start)
+
+    return list(utf_8_csv_reader(
+        data.splitlines(True),
+        columns=columns,
+        delimiter=delimiter
+        ))
+
+
+def make_row_class(fields):
+    """Génère une classe de ligne pour une liste de champs.
+
+    Args:
+        fields (list of unicode): noms des champs.
+
+    Returns:
+        :obj:`type`: classe dérivée de `CSVRow`.
+
+    """
+    return type(str('CSVRow'), (CSVRow,), {
+        '__slots__': (),
+        '_fields': tuple(fields),
+        '_positions': {field: i for i, field in enumerate(fields)},
+        })
+
+
+def make_extractor(positions):
+    """Précompile l'extraction d'une liste de positions depuis une ligne.
+
+    Args:
+        positions (list of int): positions à extraire.
+
+    Returns:
+        :obj:`function`: fonction qui prend une ligne et retourne le tuple des
+        valeurs aux positions demandées.
+
+    """
+    # `itemgetter` ne retourne pas de tuple s'il n'a qu'une position
+    if len(positions) == 1:
+        position = positions[0]
+        return lambda line: (line[position],)
+
+    return itemgetter(*positions)
+
+
+def unicode_csv_reader(unicode_csv_data, dialect=csv.excel, columns=None,
+        **kwargs):
+    """Lit un fichier CSV en UTF-8.
+
+    Args:
+        unicode_csv_data (file): descripteur de fichier à lire.
+        dialect (classjob): type de fichier CSV (je suppose).
+        columns (list): index des colonnes à garder. Seules ces colonnes sont
+            décodées, dans l'ordre de la liste. Par défaut, toutes les colonnes
+            sont gardées.
+
+    Returns:
+        :obj:`iterator`: lignes du fichier CSV décodées depuis UTF-8 vers
+        unicode.
+
+    """
+    # csv.py doesn't do Unicode; encode temporarily as UTF-8:
+    return utf_8_csv_reader(utf_8_encoder(unicode_csv_data), dialect=dialect,
+            columns=columns, **kwargs)
+
+
+def utf_8_csv_reader(utf_8_csv_data, dialect=csv.excel, columns=None,
+        **kwargs):
+    """Lit des lignes CSV encodées en UTF-8.
+
+    Args:
+        utf_8_csv_data (:obj:`iterator` of str): lignes encodées en UTF-8.
+        dialect (classjob): type de fichier CSV.
+        columns (list): index des colonnes à garder. Seules ces colonnes sont
+            décodées, dans l'ordre de la liste. Par défaut, toutes les colonnes
+            sont gardées.
+
+    Returns:
+        :obj:`iterator`: lignes du fichier CSV décodées depuis UTF-8 vers
+        unicode.
+
+    """
+    csv_reader = csv.reader(utf_8_csv_data, dialect=dialect, **kwargs)
+
+    if columns is None:
+        for row in csv_reader:
+            # decode UTF-8 back to Unicode, cell by cell:
+            yield [unicode(cell, 'utf-8') for cell in row]
+
+        return
+
+    for row in csv_reader:
+        # ne décoder que les colonnes demandées
+        # les colonnes absentes d'une ligne trop courte (les lignes d'entête
+        # notamment) sont considérées comme vides
+        width = len(row)
+        yield [unicode(row[column], 'utf-8') if column < width else ''
+                for column in columns]
+
+
+def utf_8_encoder(unicode_csv_data):
+    """Renvoit les lignes d'un descripteur de fichier en UTF-8.
+
+    Args:
+        unicode_csv_data (file): descripteur du fichier à lire.
+
+    Returns:
+        :obj:`iterator`: lignes du fichier encodées en UTF-8.
+
+    """
+    for line in unicode_csv_data:
+        yield line.encode(b'utf-8')
+
+
+def fingerprint(file_name):
+    """Calcule l'empreinte d'un fichier.
+
+    Args:
+        file_name (unicode): chemin vers le fichier.
+
+    Returns:
+        tuple: chemin absolu, taille, date de modification et hash SHA-1 du
+        contenu du fichier.
+
+    """
+    stat = os.stat(file_name)
+    content_hash = hashlib.sha1()
+    with open(file_name, 'rb') as file:
+        for block in iter(lambda: file.read(65536), b''):
+            content_hash.update(block)
+
+    return (
+            os.path.abspath(file_name),
+            stat.st_size,
+            stat.st_mtime,
+            content_hash.hexdigest(),
+            )
+
+
+def signature(file_name):
+    """Donne la signature d'un fichier sans lire son contenu.
+
+    Args:
+        file_name (unicode): chemin vers le fichier.
+
+    Returns:
+        tuple: chemin absolu, taille, date de modification et numéro d'inode
+        du fichier, ou `None` s'il n'existe pas.
+
+    """
+    try:
+        stat = os.stat(file_name)
+
+    except OSError:
+        return None
+
+    return (
+            os.path.abspath(file_name),
+            stat.st_size,
+            stat.st_mtime,
+            stat.st_ino,
+            )
 
 
 def col2num(col):
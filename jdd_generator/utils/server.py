@@ -0,0 +1,199 @@
+#-*- coding: utf8 -*-
+"""Serveur de commandes
+
+Module permettant de piloter un processus qui reste en mémoire au travers d'un
+socket Unix. Chaque requête est un objet JSON sur une ligne, qui désigne une
+commande par sa clé `command`. La réponse est aussi un objet JSON sur une
+ligne, avec la clé `ok` à vrai ou faux, et la clé `error` en cas d'échec.
+
+```
+$ echo '{"command": "build"}' | socat - UNIX-CONNECT:jddgen.sock
+{"ok": true, "messages": [], ...}
+```
+
+Les commandes sont exécutées les unes après les autres. Une commande déclarée
+regroupable qui attend la fin d'une exécution de la même commande, démarrée
+après son arrivée, reçoit directement la réponse de cette exécution.
+
+"""
+
+
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+import os
+import sys
+import json
+import logging
+import threading
+from SocketServer import ThreadingMixIn, UnixStreamServer, StreamRequestHandler
+
+
+class CommandServer(ThreadingMixIn, UnixStreamServer):
+    """Serveur de commandes JSON sur un socket Unix.
+
+    Chaque connexion est traitée dans son propre thread, mais un verrou
+    garantit qu'une seule commande s'exécute à la fois.
+
+    Attributes:
+        logger (:obj:`logging.Logger`): logger pour toute la classe.
+        commands (dict): fonction de chaque commande, indexée par nom. Elle
+            reçoit la requête et donne un dictionnaire ajouté à la réponse.
+        coalesce (tuple): noms des commandes regroupables.
+        lock (:obj:`threading.Lock`): verrou d'exécution des commandes.
+        tickets_lock (:obj:`threading.Lock`): verrou du compteur de requêtes.
+        tickets (int): nombre de requêtes reçues.
+        results (dict): pour chaque commande regroupable, numéro de la
+            dernière requête reçue au démarrage de sa dernière exécution, et
+            réponse de cette exécution.
+
+    Args:
+        path (unicode): chemin du socket Unix.
+        commands (dict): fonction de chaque commande, indexée par nom.
+        coalesce (tuple): noms des commandes regroupables.
+
+    """
+    logger = logging.getLogger('utils.server.CommandServer')
+    daemon_threads = True
+
+    def __init__(self, path, commands, coalesce=()):
+        self.commands = commands
+        self.coalesce = coalesce
+        self.lock = threading.Lock()
+        self.tickets_lock = threading.Lock()
+        self.tickets = 0
+        self.results = {}
+
+        # un socket laissé par un serveur précédent empêche de démarrer
+        if os.path.exists(path):
+            os.remove(path)
+
+        UnixStreamServer.__init__(self, path, CommandHandler)
+
+    def execute(self, request):
+        """Exécute une requête.
+
+        Args:
+            request (dict): requête décodée.
+
+        Returns:
+            dict: réponse à la requête.
+
+        """
+        with self.tickets_lock:
+            self.tickets += 1
+            ticket = self.tickets
+
+        name = request.get('command') if isinstance(request, dict) else None
+        if name not in self.commands:
+            return {
+                    'ok': False,
+                    'error': "Commande inconnue \"{}\", les commandes sont : \
+{}".format(name, ", ".join(sorted(self.commands))),
+                    }
+
+        with self.lock:
+            # la dernière exécution a démarré après l'arrivée de la requête,
+            # sa réponse convient donc
+            if name in self.coalesce and name in self.results and \
+                    self.results[name][0] >= ticket:
+                self.logger.debug("Regroupe la commande \"{}\"".format(name))
+                return dict(self.results[name][1], coalesced=True)
+
+            with self.tickets_lock:
+                started = self.tickets
+
+            response = self._run(name, request)
+
+            if name in self.coalesce:
+                self.results[name] = (started, response)
+
+            return response
+
+    def _run(self, name, request):
+        """Exécute une commande en gardant les avertissements émis.
+
+        Args:
+            name (unicode): nom de la commande.
+            request (dict): requête décodée.
+
+        Returns:
+            dict: réponse à la requête.
+
+        """
+        handler = MessagesHandler()
+        root = logging.getLogger()
+        root.addHandler(handler)
+
+        self.logger.info("Exécute la commande \"{}\"".format(name))
+
+        try:
+            response = dict(self.commands[name](request), ok=True)
+
+        except Exception as error:
+            # les messages d'erreur du projet sont encodés pour la console
+            try:
+                message = unicode(error)
+
+            except UnicodeDecodeError:
+                message = str(error).decode(sys.stderr.encoding or 'utf8')
+
+            response = {'ok': False, 'error': message}
+
+        finally:
+            root.removeHandler(handler)
+
+        if not response['ok']:
+            self.logger.error(response['error'])
+
+        response['messages'] = handler.messages
+
+        return response
+
+    def server_close(self):
+        """Ferme le serveur et supprime le socket.
+
+        """
+        UnixStreamServer.server_close(self)
+        if os.path.exists(self.server_address):
+            os.remove(self.server_address)
+
+
+class CommandHandler(StreamRequestHandler):
+    """Traite les requêtes d'une connexion, une par ligne.
+
+    """
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            if not line.strip():
+                continue
+
+            try:
+                request = json.loads(line)
+
+            except ValueError:
+                response = {'ok': False, 'error': "Requête JSON invalide"}
+
+            else:
+                response = self.server.execute(request)
+
+            self.wfile.write(json.dumps(response) + b'\n')
+            self.wfile.flush()
+
+
+class MessagesHandler(logging.Handler):
+    """Garde les messages d'avertissement et d'erreur émis.
+
+    Attributes:
+        messages (list): niveau et texte de chaque message.
+
+    """
+    def __init__(self):
+        logging.Handler.__init__(self, logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append({
+            'level': record.levelname,
+            'message': record.getMessage(),
+            })
@@ -0,0 +1,141 @@
+#-*- coding: utf8 -*-
+"""Surveillance de fichiers
+
+Module permettant de détecter les modifications d'une série de fichiers et de
+dossiers. La détection se fait par scrutation : l'état de chaque chemin est
+relevé à intervalle régulier et comparé au relevé précédent. Cette méthode ne
+dépend d'aucune bibliothèque externe et fonctionne sur tous les systèmes de
+fichiers.
+
+>>> watcher = Watcher(['timings.csv', 'photos'], interval=0.5)
+>>> changed = watcher.wait()
+
+"""
+
+
+from __future__ import unicode_literals
+from __future__ import absolute_import
+
+import os
+import time
+import logging
+
+
+class Watcher(object):
+    """Surveille des fichiers et des dossiers par scrutation.
+
+    L'état d'un fichier est sa date de modification, sa taille et son numéro
+    d'inode, ce qui détecte aussi les fichiers remplacés par renommage. L'état
+    d'un dossier est celui de chacun des fichiers qu'il contient directement.
+    Un chemin qui n'existe pas encore est surveillé jusqu'à son apparition.
+
+    Attributes:
+        logger (:obj:`logging.Logger`): logger pour toute la classe.
+        interval (float): intervalle en secondes entre deux relevés.
+        states (dict): dernier état relevé de chaque chemin surveillé, indexé
+            par chemin absolu.
+
+    Args:
+        paths (list of unicode): chemins des fichiers et dossiers à surveiller.
+        interval (float): intervalle en secondes entre deux relevés.
+
+    """
+    logger = logging.getLogger('utils.watch.Watcher')
+
+    def __init__(self, paths=(), interval=1.0):
+        self.interval = interval
+        self.states = {}
+        self.set_paths(paths)
+
+    def set_paths(self, paths):
+        """Change les chemins surveillés.
+
+        Les chemins déjà surveillés gardent leur dernier état relevé, pour ne
+        pas manquer une modification survenue entre temps.
+
+        Args:
+            paths (list of unicode): chemins des fichiers et dossiers à
+                surveiller.
+
+        """
+        states = {}
+        for path in paths:
+            path = os.path.abspath(path)
+            if path in self.states:
+                states[path] = self.states[path]
+
+            else:
+                states[path] = get_state(path)
+
+        self.states = states
+        self.logger.debug("Surveille {amount} chemins".format(
+            amount=len(self.states)
+            ))
+
+    def check(self):
+        """Relève l'état des chemins surveillés.
+
+        Returns:
+            list of unicode: chemins absolus dont l'état a changé depuis le
+            relevé précédent, triés par ordre alphabétique.
+
+        """
+        changed = []
+        for path, previous in self.states.iteritems():
+            state = get_state(path)
+            if state != previous:
+                self.states[path] = state
+                changed.append(path)
+
+        for path in changed:
+            self.logger.debug("Le chemin \"{path}\" a changé".format(
+                path=path
+                ))
+
+        return sorted(changed)
+
+    def wait(self):
+        """Attend la modification d'au moins un chemin surveillé.
+
+        Returns:
+            list of unicode: chemins absolus qui ont changé.
+
+        """
+        while True:
+            changed = self.check()
+            if changed:
+                return changed
+
+            time.sleep(self.interval)
+
+
+def get_state(path):
+    """Relève l'état d'un fichier ou d'un dossier.
+
+    Args:
+        path (unicode): chemin du fichier ou du dossier.
+
+    Returns:
+        tuple: état du chemin, ou `None` s'il n'existe pas.
+
+    """
+    try:
+        stat = os.stat(path)
+
+    except OSError:
+        return None
+
+    if not os.path.isdir(path):
+        return (stat.st_mtime, stat.st_size, stat.st_ino)
+
+    try:
+        names = sorted(os.listdir(path))
+
+    except OSError:
+        return None
+
+    return tuple(
+            (name, get_state(os.path.join(path, name)))
+            for name in names
+            if not os.path.isdir(os.path.join(path, name))
+            )
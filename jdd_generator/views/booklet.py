@@ -39,10 +39,15 @@ class BookletView(BasicView):
             la section a été chargé par Jinja2.
         booklet_template_loaded (bool): flag pour indiquer si le template du
             recueil a été chargé par Jinja2.
+
+    Args:
+        jobs (int): nombre de processus utilisés pour le rendu des sections.
+        manifest (dict): empreintes des fichiers déjà générés.
     """
     logger = logging.getLogger('views.booklet.BookletView')
 
-    def __init__(self):
+    def __init__(self, jobs=1, manifest=None):
+        super(BookletView, self).__init__(jobs=jobs, manifest=manifest)
         self.section_template_loaded = False
         self.booklet_template_loaded = False
 
@@ -71,8 +76,9 @@ class BookletView(BasicView):
             section_dict = utils.todict(section)
             sections_dict.append(section_dict)
 
-            # demander un rendu
-            section_content = self._retrieve_section(section_dict)
+        # demander un rendu, éventuellement en parallèle
+        for section_dict, section_content in zip(sections_dict,
+                self._retrieve_sections(sections_dict)):
             section_dict['file_name'] = section_content['file_name']
             files_content.append(section_content)
 
@@ -81,15 +87,16 @@ class BookletView(BasicView):
 
         return files_content
 
-    def _retrieve_section(self, section_dict):
-        """Formate une section dans le template.
+    def _retrieve_sections(self, sections_dict):
+        """Formate les sections dans le template.
 
         Args:
-            section_dict (:obj:`dict`): section sous forme de dictionnaire.
+            sections_dict (:obj:`list` of :obj:`dict`): sections sous forme de
+                dictionnaire.
 
         Returns:
-            :obj:`dict`: dictionnaire contenant le nom de fichier à créer et le
-            contenu texte.
+            :obj:`list` of :obj:`dict`: dictionnaires contenant le nom de
+            fichier à créer et le contenu texte, dans l'ordre des sections.
 
         """
         # charger le template
@@ -101,26 +108,29 @@ class BookletView(BasicView):
                     )
                 ))
 
-        template = self.environment.get_template(SECTION_TEMPLATE)
         self.section_template_loaded = True
 
-        # ajouter le dossier des photos
-        section_dict['directory_pictures'] = PICTURES_TARGET_DIRECTORY
-
         # ajouter la config 'others' comme variable globale, sous forme de
         # dictionaire
-        section_dict['config_others'] = dict(config.items('others'))
-
-        # rendre la section
-        text = template.render(section_dict)
-        file_name = SECTION_PATTERN.format(section_dict['number'])
-        self.logger.debug("Génère le texte pour la section \
+        config_others = dict(config.items('others'))
+
+        for section_dict in sections_dict:
+            # ajouter le dossier des photos
+            section_dict['directory_pictures'] = PICTURES_TARGET_DIRECTORY
+            section_dict['config_others'] = config_others
+
+        # rendre les sections
+        sections = self._render_files(SECTION_TEMPLATE, [
+            (SECTION_PATTERN.format(section_dict['number']), section_dict)
+            for section_dict in sections_dict
+            ])
+
+        for section_dict, section in zip(sections_dict, sections):
+            if section['text'] is not None:
+                self.logger.debug("Génère le texte pour la section \
 \"{section}\"".format(section=section_dict['number']))
 
-        return {
-                'file_name': file_name,
-                'text': text,
-                }
+        return sections
 
     def _retrieve_booklet(self, sections_dict):
         """Formate le fichier principal du recueil.
@@ -143,15 +153,15 @@ class BookletView(BasicView):
                     )
                 ))
 
-        template = self.environment.get_template(BOOKLET_TEMPLATE)
         self.booklet_template_loaded = True
 
         # rendre le recueil
-        text = template.render({'sections': sections_dict})
-        file_name = BOOKLET_PATTERN
-        self.logger.debug("Génère le texte pour le recueil de résumés courts")
-
-        return {
-                'file_name': file_name,
-                'text': text,
-                }
+        booklet, = self._render_files(BOOKLET_TEMPLATE, [
+            (BOOKLET_PATTERN, {'sections': sections_dict})
+            ])
+
+        if booklet['text'] is not None:
+            self.logger.debug("Génère le texte pour le recueil de résumés \
+courts")
+
+        return booklet
@@ -5,10 +5,17 @@ from __future__ import absolute_import
 import os
 import sys
 import logging
+import copy_reg
+import hashlib
+import json
 from codecs import open
+from datetime import date, time, timedelta
+from multiprocessing import Pool
 
-from jinja2 import Environment, FileSystemLoader
+from jinja2 import Environment, FileSystemLoader, meta
+from colour import Color
 
+from .. import __version__
 from ..utils import utils
 
 
@@ -35,15 +42,26 @@ class JddView(object):
 
     Attributes:
         logger (:obj:`logging.Logger`): logger pour toute la classe.
+        manifest (dict): empreintes des fichiers déjà générés, ou `None` pour
+            tout générer.
+
+    Args:
+        manifest (dict): empreintes des fichiers déjà générés, indexées par
+            nom de fichier. Par défaut, tous les fichiers sont générés.
 
     """
     logger = logging.getLogger('views.sessions.JddView')
 
+    def __init__(self, manifest=None):
+        self.manifest = manifest
+
     def retrieve(self):
         """Copie les fichiers conteneurs.
 
         Returns:
-            :obj:`dict`: dictionnaire du nom de fichier et du texte.
+            :obj:`dict`: dictionnaire du nom de fichier, du texte et de
+            l'empreinte des données d'entrée. Le texte vaut `None` si le
+            fichier est déjà à jour.
 
         """
         # charger les fichiers
@@ -54,25 +72,29 @@ class JddView(object):
 
             main = file.read()
 
+        if self.manifest is None:
+            return {
+                    'file_name': MAIN_PATTERN,
+                    'text': main,
+                    'digest': None,
+                    }
+
+        digest = digest_inputs(main)
+        if self.manifest.get(MAIN_PATTERN) == digest:
+            main = None
+
         return {
                 'file_name': MAIN_PATTERN,
                 'text': main,
+                'digest': digest,
                 }
 
-class BasicView(object):
-    """Vue basique.
+def make_environment():
+    """Crée l'environnement de templates pour Jinja2.
 
-    La vue récupère les données stockées par les modèles et mises en ordre par
-    le contrôleur. Elle utilise Jinja2 pour le moteur de template.
-
-    Cette vue sert de modèle aux autres vues, elle se contente de mettre en
-    place l'environnement pour Jinja2.
-
-    Attributes:
-        environment (:obj:`jinja2.environment.Environment`): enviornnement de
-            templates pour Jinja2. Il a été adapté pour que la syntaxe coïncide
-            avec LaTeX. Les accolades LaTeX faisaient interférence avec les
-            accolades du langage de template par défaut.
+    Returns:
+        :obj:`jinja2.environment.Environment`: environnement dont la syntaxe a
+        été adaptée à LaTeX.
 
     """
     environment = Environment(
@@ -99,3 +121,273 @@ class BasicView(object):
     # load tests
     environment.tests['equalto_case_insensitive'] = \
             utils.equalto_case_insensitive
+
+    return environment
+
+
+class BasicView(object):
+    """Vue basique.
+
+    La vue récupère les données stockées par les modèles et mises en ordre par
+    le contrôleur. Elle utilise Jinja2 pour le moteur de template.
+
+    Cette vue sert de modèle aux autres vues, elle se contente de mettre en
+    place l'environnement pour Jinja2 et de rendre une série de données dans un
+    template, éventuellement sur plusieurs processus.
+
+    Attributes:
+        environment (:obj:`jinja2.environment.Environment`): enviornnement de
+            templates pour Jinja2. Il a été adapté pour que la syntaxe coïncide
+            avec LaTeX. Les accolades LaTeX faisaient interférence avec les
+            accolades du langage de template par défaut.
+        jobs (int): nombre de processus utilisés pour le rendu.
+        manifest (dict): empreintes des fichiers déjà générés, ou `None` pour
+            tout rendre.
+        template_digests (dict): empreinte de chaque template et des templates
+            qu'il utilise.
+
+    Args:
+        jobs (int): nombre de processus utilisés pour le rendu. Par défaut,
+            tout se fait dans le processus courant.
+        manifest (dict): empreintes des fichiers déjà générés, indexées par
+            nom de fichier. Seuls les fichiers dont l'empreinte a changé sont
+            rendus. Par défaut, tous les fichiers sont rendus.
+
+    """
+    environment = make_environment()
+
+    def __init__(self, jobs=1, manifest=None):
+        self.jobs = jobs
+        self.manifest = manifest
+        self.template_digests = {}
+
+    def _render_files(self, template_name, files):
+        """Rend les fichiers dont les données d'entrée ont changé.
+
+        L'empreinte d'un fichier couvre les données passées au template, le
+        source du template et des templates qu'il utilise, et la version du
+        générateur. Si elle est identique à celle du manifeste, le fichier
+        n'est pas rendu.
+
+        Args:
+            template_name (unicode): nom du template.
+            files (:obj:`list` of tuple): nom de fichier et données à rendre
+                de chaque fichier.
+
+        Returns:
+            :obj:`list` of :obj:`dict`: dictionnaires contenant le nom de
+            fichier, le contenu texte et l'empreinte des données d'entrée,
+            dans l'ordre des fichiers. Le texte peut être une suite de
+            morceaux rendus à la demande (voir `_render_all`), et vaut `None`
+            si le fichier est déjà à jour.
+
+        """
+        contents = []
+        for file_name, context in files:
+            if self.manifest is None:
+                digest = None
+
+            else:
+                digest = digest_inputs(
+                        self._template_digest(template_name),
+                        context
+                        )
+
+            contents.append({
+                'file_name': file_name,
+                'text': None,
+                'digest': digest,
+                })
+
+        # ne rendre que les fichiers qui ne sont pas à jour
+        outdated = [
+                (content, context)
+                for content, (file_name, context) in zip(contents, files)
+                if self.manifest is None or
+                self.manifest.get(file_name) != content['digest']
+                ]
+
+        texts = self._render_all(
+                template_name,
+                [context for content, context in outdated]
+                )
+
+        for (content, context), text in zip(outdated, texts):
+            content['text'] = text
+
+        return contents
+
+    def _template_digest(self, template_name):
+        """Calcule l'empreinte d'un template et des templates qu'il utilise.
+
+        Les templates utilisés sont découverts par Jinja2 au travers des
+        balises `include`, `extends` et `import`. Si l'un d'eux est désigné par
+        une variable, tous les templates du dossier sont pris en compte.
+
+        Args:
+            template_name (unicode): nom du template.
+
+        Returns:
+            unicode: empreinte des sources des templates.
+
+        """
+        if template_name in self.template_digests:
+            return self.template_digests[template_name]
+
+        sources = {}
+        names = [template_name]
+        while names:
+            name = names.pop()
+            if name in sources:
+                continue
+
+            source = self.environment.loader.get_source(
+                    self.environment,
+                    name
+                    )[0]
+
+            sources[name] = source
+
+            for referenced in meta.find_referenced_templates(
+                    self.environment.parse(source)):
+                if referenced is None:
+                    names.extend(self.environment.list_templates())
+
+                else:
+                    names.append(referenced)
+
+        digest = digest_inputs(sources)
+        self.template_digests[template_name] = digest
+
+        return digest
+
+    def _render_all(self, template_name, contexts):
+        """Rend un même template pour une série de données.
+
+        Sur un seul processus, le rendu se fait au fil de l'écriture : chaque
+        texte est une suite de morceaux produits à la demande, et seul le
+        fichier en cours d'écriture est en mémoire. Si plusieurs processus
+        sont demandés, les rendus sont répartis entre eux, chacun ayant son
+        propre environnement Jinja2, et les textes complets sont renvoyés. Les
+        textes sont toujours dans l'ordre des données.
+
+        Args:
+            template_name (unicode): nom du template.
+            contexts (:obj:`list` of :obj:`dict`): données à rendre.
+
+        Returns:
+            list: textes rendus, ou suites de morceaux de texte à rendre.
+
+        """
+        if self.jobs <= 1 or len(contexts) <= 1:
+            template = self.environment.get_template(template_name)
+
+            # Le rendu ne commence qu'à l'écriture, les données sont donc
+            # copiées pour ne pas voir les clés ajoutées entre temps.
+            return [template.generate(dict(context)) for context in contexts]
+
+        pool = Pool(min(self.jobs, len(contexts)), init_render_worker)
+        try:
+            return pool.map(
+                    render_template,
+                    [(template_name, context) for context in contexts]
+                    )
+
+        finally:
+            pool.close()
+            pool.join()
+
+
+# environnement propre à chaque processus de rendu
+worker_environment = None
+
+
+def init_render_worker():
+    """Crée l'environnement Jinja2 d'un processus de rendu.
+
+    """
+    global worker_environment
+    worker_environment = make_environment()
+
+
+def render_template(job):
+    """Rend un template dans un processus de rendu.
+
+    Args:
+        job (tuple): nom du template et données à rendre.
+
+    Returns:
+        unicode: texte rendu.
+
+    """
+    template_name, context = job
+    return worker_environment.get_template(template_name).render(context)
+
+
+def digest_inputs(*values):
+    """Calcule l'empreinte de données d'entrée d'un fichier généré.
+
+    La version du générateur fait partie de l'empreinte, pour que tous les
+    fichiers soient générés à nouveau après une mise à jour.
+
+    Args:
+        *values: données à prendre en compte.
+
+    Returns:
+        unicode: empreinte des données.
+
+    """
+    data = json.dumps(
+            [__version__] + list(values),
+            sort_keys=True,
+            default=encode_input
+            )
+
+    return hashlib.sha1(data).hexdigest().decode('ascii')
+
+
+def encode_input(value):
+    """Convertit une donnée d'entrée en valeur sérialisable en JSON.
+
+    Les objets des modèles, par exemple les présentations d'une session, sont
+    convertis en dictionnaire de leurs attributs, que le module `json`
+    parcourt à son tour : toutes leurs données entrent ainsi dans l'empreinte.
+
+    Args:
+        value: donnée que le module `json` ne sait pas sérialiser.
+
+    Returns:
+        valeur sérialisable représentant la donnée.
+
+    """
+    if isinstance(value, Color):
+        return list(value.hsl)
+
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+
+    if hasattr(value, '__dict__'):
+        return value.__dict__
+
+    return unicode(value)
+
+
+def restore_color(hsl):
+    """Recrée une couleur depuis ses composantes HSL.
+
+    Args:
+        hsl (tuple): composantes HSL de la couleur.
+
+    Returns:
+        :obj:`colour.Color`: couleur.
+
+    """
+    return Color(hsl=hsl)
+
+
+# les couleurs doivent pouvoir être envoyées aux processus de rendu, mais
+# elles gardent une fonction en attribut, que `pickle` ne sait pas traiter
+copy_reg.pickle(Color, lambda color: (restore_color, (color.hsl,)))
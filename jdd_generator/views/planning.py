@@ -37,10 +37,15 @@ class PlanningView(BasicView):
             session a été chargé par Jinja2.
         planning_template_loaded (bool): flag pour indiquer si le template de
             planning a été chargé par Jinja2.
+
+    Args:
+        jobs (int): nombre de processus utilisés pour le rendu des sessions.
+        manifest (dict): empreintes des fichiers déjà générés.
     """
     logger = logging.getLogger('views.sessions.SessionsView')
 
-    def __init__(self):
+    def __init__(self, jobs=1, manifest=None):
+        super(PlanningView, self).__init__(jobs=jobs, manifest=manifest)
         self.session_template_loaded = False
         self.planning_template_loaded = False
 
@@ -62,6 +67,7 @@ class PlanningView(BasicView):
         # Jinja2 n'accepte que des dictionnaires en entrée, on va devoir tout
         # convertir
         events_dict = []
+        sessions_dict = []
 
         # parcourir chaque event
         for event in events:
@@ -74,26 +80,44 @@ class PlanningView(BasicView):
             # veut les rendre chacune dans un fichier, il faut les traiter à
             # part.
             if event.event_type == 'session':
-                session = self._retrieve_session(event_dict)
-                event_dict['file_name'] = session['file_name']
-                event_dict['event_type'] = 'session'
+                sessions_dict.append(event_dict)
+
+        # rendre les sessions, éventuellement en parallèle
+        for session_dict, session in zip(sessions_dict,
+                self._retrieve_sessions(sessions_dict)):
+            session_dict['file_name'] = session['file_name']
+            session_dict['event_type'] = 'session'
 
-                files_content.append(session)
+            files_content.append(session)
 
         # rendre le fichier de planning
         files_content.append(self._retrieve_planning(events_dict))
 
         return files_content
 
-    def _retrieve_session(self, session_dict):
-        """Formate une sessions dans le template.
+    def retrieve_session(self, session):
+        """Formate une seule session dans le template.
 
         Args:
-            session_dict (:obj:`dict`): session sous forme de dictionnaire.
+            session (:obj:`Session`): session à formater.
 
         Returns:
             :obj:`dict`: dictionnaire contenant le nom de fichier à créer et le
-            contenu texte.
+            contenu texte de la session.
+
+        """
+        return self._retrieve_sessions([utils.todict(session)])[0]
+
+    def _retrieve_sessions(self, sessions_dict):
+        """Formate les sessions dans le template.
+
+        Args:
+            sessions_dict (:obj:`list` of :obj:`dict`): sessions sous forme de
+                dictionnaire.
+
+        Returns:
+            :obj:`list` of :obj:`dict`: dictionnaires contenant le nom de
+            fichier à créer et le contenu texte, dans l'ordre des sessions.
 
         """
         # charger le template
@@ -105,20 +129,20 @@ class PlanningView(BasicView):
                     )
                 ))
 
-        template = self.environment.get_template(SESSION_TEMPLATE)
         self.session_template_loaded = True
 
         # mettre le contenu des sessions dans un template
-        text = template.render(session_dict)
-        file_name = SESSION_PATTERN.format(session_dict['number'])
-
-        self.logger.debug("Génére le texte pour la session \
+        sessions = self._render_files(SESSION_TEMPLATE, [
+            (SESSION_PATTERN.format(session_dict['number']), session_dict)
+            for session_dict in sessions_dict
+            ])
+
+        for session_dict, session in zip(sessions_dict, sessions):
+            if session['text'] is not None:
+                self.logger.debug("Génére le texte pour la session \
 \"{session}\"".format(session=session_dict['number']))
 
-        return {
-            'file_name': file_name,
-            'text': text
-            }
+        return sessions
 
     def _retrieve_planning(self, events_dict):
         """Formate le fichier principal du planning.
@@ -141,15 +165,14 @@ class PlanningView(BasicView):
                     )
                 ))
 
-        template = self.environment.get_template(PLANNING_TEMPLATE)
         self.planning_template_loaded = True
 
         # rendre le planning
-        text = template.render({'events': events_dict})
-        file_name = PLANNING_PATTERN
-        self.logger.debug("Génére le texte pour le planning")
-
-        return {
-                'file_name': file_name,
-                'text': text
-                }
+        planning, = self._render_files(PLANNING_TEMPLATE, [
+            (PLANNING_PATTERN, {'events': events_dict})
+            ])
+
+        if planning['text'] is not None:
+            self.logger.debug("Génére le texte pour le planning")
+
+        return planning